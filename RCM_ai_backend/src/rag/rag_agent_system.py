@@ -7,10 +7,20 @@ and provides accurate responses to queries about medical coding, billing, and re
 """
 
 import os
+import re
+import json
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from pathlib import Path
 
+import chromadb
+import numpy as np
+import torch
+
 # Environment and configuration
 from dotenv import load_dotenv
 
@@ -23,9 +33,18 @@ from langchain_community.document_loaders import (
 )
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores.chroma import Chroma
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
 from langchain_openai import ChatOpenAI
+from transformers import AutoTokenizer
+
+from rag_embeddings import (
+    AutocastHuggingFaceEmbeddings,
+    CachedEmbeddings,
+    QuantizedONNXEmbeddings
+)
 
 # CrewAI imports
 from crewai import Agent, Task, Crew, Process
@@ -38,6 +57,65 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Number of chunks embedded and written to the vector store per call.
+# ChromaDB performs best with batches in the 100-250 range.
+EMBEDDING_BATCH_SIZE = 128
+
+# HNSW parameters for the FAISS vector store
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Number of documents retrieved per query
+RETRIEVAL_K = 5
+
+# Retrieval answers matching this pattern are not trusted and the query is
+# handed to the agent crew instead
+UNCERTAIN_ANSWER_PATTERN = re.compile(
+    r"\b(?:i don['’]t know|i do not know|not sure|unable to|cannot (?:answer|determine|find)"
+    r"|no (?:relevant )?information|not (?:mentioned|provided|specified|included) in the)\b",
+    re.IGNORECASE
+)
+
+# Source file patterns handled by load_documents
+DOCUMENT_PATTERNS = ["*.pdf", "*.txt", "*.json"]
+
+# File in the persist directory recording the content hash and chunk ids
+# of every indexed source file
+MANIFEST_FILE = "manifest.json"
+
+def _load_file(file_path: str) -> List[Any]:
+    """
+    Load a single source file into documents
+    
+    Kept at module level so it can be pickled into worker processes.
+    
+    Args:
+        file_path: Path to a PDF, text or JSON file
+        
+    Returns:
+        List of documents
+    """
+    suffix = Path(file_path).suffix.lower()
+    
+    if suffix == ".pdf":
+        logger.info(f"Loading PDF file: {file_path}")
+        loader = PyPDFLoader(file_path)
+    elif suffix == ".txt":
+        logger.info(f"Loading text file: {file_path}")
+        loader = TextLoader(file_path)
+    else:
+        logger.info(f"Loading JSON file: {file_path}")
+        # For JSON files, we need to specify the jq schema to extract text
+        # This is a simple example, you might need to adjust based on your JSON structure
+        loader = JSONLoader(
+            file_path=file_path,
+            jq_schema='.',
+            text_content=False
+        )
+    
+    return loader.load()
+
 class RAGAgentSystem:
     """
     RAG System with AI Agents using ChromaDB
@@ -49,8 +127,15 @@ class RAGAgentSystem:
         persist_dir: str = "./chroma_db",
         embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         llm_model_name: str = "gpt-3.5-turbo",
-        chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_size: int = 256,
+        chunk_overlap: int = 0,
+        device: Optional[str] = None,
+        quantize_embeddings: bool = False,
+        vector_store_type: str = "chroma",
+        quantize_vectors: bool = False,
+        query_cache_threshold: Optional[float] = 0.97,
+        llm_base_url: Optional[str] = None,
+        embedding_cache_dir: Optional[str] = "./emb_cache"
     ):
         """
         Initialize the RAG system
@@ -60,8 +145,27 @@ class RAGAgentSystem:
             persist_dir: Directory to persist the vector database
             embedding_model_name: Name of the embedding model to use
             llm_model_name: Name of the LLM to use
-            chunk_size: Size of chunks to split documents into
-            chunk_overlap: Overlap between chunks
+            chunk_size: Size of chunks to split documents into, in tokens
+                of the embedding model including its special tokens, at
+                most the model's max sequence length (256 for the default)
+            chunk_overlap: Overlap between chunks, in tokens
+            device: Device to run the embedding model on, defaults to CUDA
+                when available and CPU otherwise
+            quantize_embeddings: Whether to run the embedding model as an
+                int8-quantized ONNX model on CPU instead
+            vector_store_type: Vector store backend, "chroma" or "faiss"
+                (FAISS HNSW index)
+            quantize_vectors: Whether to store vectors as 8-bit scalar
+                quantized codes, only supported by the FAISS backend.
+                Vectors are L2-normalized so they fit the quantizer range.
+            query_cache_threshold: Minimum cosine similarity between a query
+                and a previously answered query to reuse its response, None
+                disables the query cache
+            llm_base_url: Base URL of an OpenAI-compatible server such as
+                vLLM, defaults to the LLM_BASE_URL environment variable and
+                falls back to the OpenAI API
+            embedding_cache_dir: Directory to cache document embeddings in,
+                None disables the cache
         """
         self.data_dir = Path(data_dir)
         self.persist_dir = Path(persist_dir)
@@ -69,105 +173,445 @@ class RAGAgentSystem:
         self.llm_model_name = llm_model_name
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.vector_store_type = vector_store_type
+        self.quantize_vectors = quantize_vectors
+        
+        if vector_store_type not in ("chroma", "faiss"):
+            raise ValueError(f"Unsupported vector store type: {vector_store_type}")
+        if quantize_vectors and vector_store_type != "faiss":
+            raise ValueError("Vector quantization is only supported by the FAISS vector store")
         
         # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+        if quantize_embeddings:
+            self.embeddings = QuantizedONNXEmbeddings(model_name=embedding_model_name)
+            embedding_cache_namespace = f"{embedding_model_name}-onnx-int8"
+        elif self.device.startswith("cuda"):
+            # Run the embedding model in half precision on GPU, in large
+            # batches under autocast, for documents and queries alike. The
+            # embeddings are cast back to float32, so stored vectors stay
+            # float32.
+            self.embeddings = AutocastHuggingFaceEmbeddings(
+                model_name=embedding_model_name,
+                model_kwargs={"device": self.device},
+                encode_kwargs={"batch_size": 256}
+            )
+            self.embeddings.client.half()
+            embedding_cache_namespace = f"{embedding_model_name}-fp16"
+        else:
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name=embedding_model_name,
+                model_kwargs={"device": self.device},
+                encode_kwargs={"batch_size": 64}
+            )
+            embedding_cache_namespace = embedding_model_name
+        
+        # Reuse embeddings of unchanged chunks across rebuilds
+        if embedding_cache_dir is not None:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                cache_dir=embedding_cache_dir,
+                namespace=embedding_cache_namespace
+            )
         
         # Initialize LLM
+        self.llm_base_url = llm_base_url or os.getenv("LLM_BASE_URL")
         self.llm = ChatOpenAI(
             model_name=llm_model_name,
             temperature=0.2,
+            openai_api_base=self.llm_base_url,
         )
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
+        # Initialize text splitter, chunks are measured in tokens of the
+        # embedding model so they are never truncated when embedded. The
+        # splitter counts tokens without [CLS] and [SEP], which the model
+        # adds when encoding, so room is left for them.
+        tokenizer = AutoTokenizer.from_pretrained(embedding_model_name)
+        self.text_splitter = RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            tokenizer,
+            chunk_size=chunk_size - tokenizer.num_special_tokens_to_add(),
             chunk_overlap=chunk_overlap,
-            length_function=len,
         )
         
-        # Initialize vector store
+        # Initialize vector store and the retrieval chain built on it
         self.vector_store = None
+        self._retrieval_chain = None
+        
+        # Agent crews, built once per thread on first use since CrewAI
+        # mutates tasks while a crew runs
+        self._crews = threading.local()
         
-    def load_documents(self) -> List[Any]:
+        # Semantic cache of query responses, opened on first use
+        self.query_cache_threshold = query_cache_threshold
+        self._query_cache = None
+        
+    def _source_files(self) -> List[str]:
         """
-        Load documents from the data directory
+        List the source files in the data directory
         
         Returns:
-            List of documents
+            Resolved paths of the source files
+        """
+        return [
+            str(path.resolve())
+            for pattern in DOCUMENT_PATTERNS
+            for path in self.data_dir.glob(pattern)
+        ]
+    
+    def load_documents(self, files: Optional[List[str]] = None) -> Iterator[Any]:
+        """
+        Load documents from the data directory
+        
+        Files are parsed in parallel worker processes, one window of files
+        per worker count at a time, so only a bounded number of parsed files
+        is held in memory.
+        
+        Args:
+            files: Source files to load, defaults to all files in the data
+                directory
+        
+        Yields:
+            Documents
         """
         logger.info(f"Loading documents from {self.data_dir}")
         
-        documents = []
-        
-        # Load PDF files
-        pdf_files = list(self.data_dir.glob("*.pdf"))
-        for pdf_file in pdf_files:
-            logger.info(f"Loading PDF file: {pdf_file}")
-            loader = PyPDFLoader(str(pdf_file))
-            documents.extend(loader.load())
-        
-        # Load text files
-        txt_files = list(self.data_dir.glob("*.txt"))
-        for txt_file in txt_files:
-            logger.info(f"Loading text file: {txt_file}")
-            loader = TextLoader(str(txt_file))
-            documents.extend(loader.load())
-        
-        # Load JSON files
-        json_files = list(self.data_dir.glob("*.json"))
-        for json_file in json_files:
-            logger.info(f"Loading JSON file: {json_file}")
-            # For JSON files, we need to specify the jq schema to extract text
-            # This is a simple example, you might need to adjust based on your JSON structure
-            loader = JSONLoader(
-                file_path=str(json_file),
-                jq_schema='.',
-                text_content=False
-            )
-            documents.extend(loader.load())
+        if files is None:
+            files = self._source_files()
         
-        logger.info(f"Loaded {len(documents)} documents")
-        return documents
+        # Parse files in parallel, files are independent of each other
+        max_workers = os.cpu_count() or 1
+        num_documents = 0
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(files), max_workers):
+                window = files[start:start + max_workers]
+                for file_documents in executor.map(_load_file, window):
+                    num_documents += len(file_documents)
+                    yield from file_documents
+        
+        logger.info(f"Loaded {num_documents} documents")
     
-    def process_documents(self, documents: List[Any]) -> List[Any]:
+    def process_documents(self, documents: Iterable[Any]) -> Iterator[Any]:
         """
         Process documents by splitting them into chunks
         
         Args:
-            documents: List of documents to process
+            documents: Documents to process
             
-        Returns:
-            List of processed document chunks
+        Yields:
+            Processed document chunks
         """
         logger.info("Processing documents")
         
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(documents)
+        # Split documents into chunks one document at a time
+        num_chunks = 0
+        for document in documents:
+            for chunk in self.text_splitter.split_documents([document]):
+                num_chunks += 1
+                yield chunk
         
-        logger.info(f"Split documents into {len(chunks)} chunks")
-        return chunks
+        logger.info(f"Split documents into {num_chunks} chunks")
     
-    def create_vector_store(self, chunks: List[Any]) -> None:
+    def create_vector_store(self, chunks: Iterable[Any]) -> Dict[str, List[str]]:
         """
         Create a vector store from document chunks
         
+        Any existing vector store in the persist directory is replaced.
+        
         Args:
-            chunks: List of document chunks
+            chunks: Document chunks
+            
+        Returns:
+            Ids of the added chunks by source file
         """
         logger.info("Creating vector store")
         
-        # Create vector store
-        self.vector_store = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=str(self.persist_dir)
-        )
+        self._retrieval_chain = None
+        
+        # Start from an empty vector store, the FAISS index is created once
+        # the embedding dimension is known
+        if self.vector_store_type == "faiss":
+            self.vector_store = None
+        else:
+            Chroma(
+                persist_directory=str(self.persist_dir),
+                embedding_function=self.embeddings
+            ).delete_collection()
+            self.vector_store = Chroma(
+                persist_directory=str(self.persist_dir),
+                embedding_function=self.embeddings
+            )
+        
+        ids_by_source = self._add_chunks(chunks)
         
         # Persist vector store
-        self.vector_store.persist()
+        self._persist_vector_store()
+        
+        # Cached responses were produced from the previous documents
+        if self.query_cache_threshold is not None:
+            self.clear_query_cache()
+        
+        num_chunks = sum(len(ids) for ids in ids_by_source.values())
+        logger.info(f"Created vector store with {num_chunks} chunks")
+        return ids_by_source
+    
+    def _add_chunks(self, chunks: Iterable[Any]) -> Dict[str, List[str]]:
+        """
+        Embed document chunks and add them to the vector store
+        
+        Chunks are consumed and embedded in batches of EMBEDDING_BATCH_SIZE,
+        writing one batch overlaps with embedding the next.
+        
+        Args:
+            chunks: Document chunks
+            
+        Returns:
+            Ids of the added chunks by source file
+        """
+        ids_by_source = {}
+        seen_ids = set()
+        
+        # Batches are written by a background thread so the next batch is
+        # embedded while the previous one is being written
+        pending_write = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            chunks = iter(chunks)
+            while True:
+                window = list(islice(chunks, EMBEDDING_BATCH_SIZE))
+                if not window:
+                    break
+                
+                # Drop chunks already added in this run, both stores reject
+                # duplicate ids
+                batch = []
+                for chunk in window:
+                    chunk_id = self._chunk_id(chunk)
+                    if chunk_id not in seen_ids:
+                        seen_ids.add(chunk_id)
+                        batch.append((chunk_id, chunk))
+                        ids_by_source.setdefault(chunk.metadata.get("source"), []).append(chunk_id)
+                
+                if not batch:
+                    continue
+                
+                ids = [chunk_id for chunk_id, _ in batch]
+                texts = [chunk.page_content for _, chunk in batch]
+                metadatas = [chunk.metadata for _, chunk in batch]
+                
+                # Embed the whole batch in a single model call
+                embeddings = self.embeddings.embed_documents(texts)
+                
+                if self.vector_store_type == "faiss" and self.vector_store is None:
+                    self.vector_store = self._create_faiss_store(embeddings)
+                
+                # Wait for the previous batch before queueing this one, at
+                # most one batch is in flight
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = writer.submit(self._write_batch, ids, texts, embeddings, metadatas)
+            
+            if pending_write is not None:
+                pending_write.result()
+        
+        return ids_by_source
+    
+    def _write_batch(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Write a batch of embedded chunks to the vector store
+        
+        Args:
+            ids: Chunk ids
+            texts: Chunk texts
+            embeddings: Chunk embeddings
+            metadatas: Chunk metadata
+        """
+        if self.vector_store_type == "faiss":
+            self.vector_store.add_embeddings(
+                text_embeddings=list(zip(texts, embeddings)),
+                metadatas=metadatas,
+                ids=ids
+            )
+        else:
+            self.vector_store._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=metadatas
+            )
+    
+    def _delete_chunks(self, ids: List[str]) -> None:
+        """
+        Delete document chunks from the Chroma vector store
+        
+        FAISS HNSW indexes do not support removing vectors, stale chunks of
+        the FAISS backend are dropped by rebuilding the vector store.
+        
+        Args:
+            ids: Ids of the chunks to delete
+        """
+        self.vector_store._collection.delete(ids=ids)
+    
+    def _persist_vector_store(self) -> None:
+        """
+        Persist the vector store to the persist directory
+        """
+        if self.vector_store_type == "faiss":
+            if self.vector_store is not None:
+                self.vector_store.save_local(str(self.persist_dir))
+        else:
+            self.vector_store.persist()
+    
+    def update_vector_store(self) -> None:
+        """
+        Bring the loaded vector store in line with the data directory
+        
+        Source files are compared by content hash against the manifest.
+        Chunks of changed and deleted files are removed, and changed and new
+        files are loaded, embedded and added again. Unchanged files are not
+        touched. The FAISS index cannot remove vectors, so it is rebuilt
+        whenever files were changed or deleted.
+        """
+        logger.info("Updating vector store")
+        
+        manifest = self._read_manifest()
+        file_hashes = {path: self._file_hash(path) for path in self._source_files()}
+        
+        changed_files = [
+            path for path, file_hash in file_hashes.items()
+            if manifest.get(path, {}).get("hash") != file_hash
+        ]
+        deleted_files = [path for path in manifest if path not in file_hashes]
+        
+        if not changed_files and not deleted_files:
+            logger.info("Vector store is up to date")
+            return
+        
+        logger.info(f"{len(changed_files)} new or changed files, {len(deleted_files)} deleted files")
+        
+        # Remove the chunks of stale files
+        stale_ids = [
+            chunk_id
+            for path in changed_files + deleted_files
+            for chunk_id in manifest.get(path, {}).get("ids", [])
+        ]
+        if stale_ids and self.vector_store_type == "faiss":
+            # HNSW indexes cannot remove vectors, rebuild from all files
+            logger.info("FAISS index cannot remove stale chunks, rebuilding it")
+            self._rebuild_vector_store(file_hashes)
+            return
+        if stale_ids:
+            self._delete_chunks(stale_ids)
+        
+        # Add the chunks of new and changed files
+        ids_by_source = {}
+        if changed_files:
+            chunks = self.process_documents(self.load_documents(changed_files))
+            ids_by_source = self._add_chunks(chunks)
+        
+        self._persist_vector_store()
+        
+        for path in deleted_files:
+            del manifest[path]
+        for path in changed_files:
+            manifest[path] = {"hash": file_hashes[path], "ids": ids_by_source.get(path, [])}
+        self._write_manifest(manifest)
+        
+        # Cached responses were produced from the previous documents
+        if self.query_cache_threshold is not None:
+            self.clear_query_cache()
+    
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        """
+        Hash the content of a source file
+        
+        Args:
+            path: Path to the file
+            
+        Returns:
+            Hex digest of the file content
+        """
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the manifest of indexed source files
+        
+        Returns:
+            Content hash and chunk ids by source file
+        """
+        with open(self.persist_dir / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    
+    def _write_manifest(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Write the manifest of indexed source files
+        
+        Args:
+            manifest: Content hash and chunk ids by source file
+        """
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        
+        with open(self.persist_dir / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f, indent=2)
+    
+    def _create_faiss_store(self, embeddings: List[List[float]]) -> FAISS:
+        """
+        Create an empty FAISS vector store backed by an HNSW index
+        
+        Args:
+            embeddings: First batch of embeddings, used to size the index
+            
+        Returns:
+            FAISS vector store
+        """
+        # Imported lazily, faiss is only needed for this backend
+        import faiss
+        
+        dimension = len(embeddings[0])
+        
+        if self.quantize_vectors:
+            # 8-bit scalar quantization over the fixed [-1, 1] range of unit
+            # vectors. Training on the first batch would clip the values of
+            # later documents that fall outside the ranges seen in it.
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit_uniform, HNSW_M)
+            index.train(np.stack([-np.ones(dimension), np.ones(dimension)]).astype(np.float32))
+        else:
+            index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            # Quantized vectors must lie in the trained range
+            normalize_L2=self.quantize_vectors
+        )
+    
+    @staticmethod
+    def _chunk_id(chunk: Any) -> str:
+        """
+        Build a deterministic id for a document chunk
         
-        logger.info(f"Created vector store with {len(chunks)} chunks")
+        The source file is part of the id so chunks with the same text in
+        different files can be deleted independently.
+        
+        Args:
+            chunk: Document chunk
+            
+        Returns:
+            Hex digest of the chunk source and content
+        """
+        key = f"{chunk.metadata.get('source')}\0{chunk.page_content}"
+        return hashlib.md5(key.encode("utf-8")).hexdigest()
     
     def load_vector_store(self) -> None:
         """
@@ -175,18 +619,60 @@ class RAGAgentSystem:
         """
         logger.info(f"Loading vector store from {self.persist_dir}")
         
+        self._retrieval_chain = None
+        
         # Load vector store
-        self.vector_store = Chroma(
-            persist_directory=str(self.persist_dir),
-            embedding_function=self.embeddings
-        )
+        if self.vector_store_type == "faiss":
+            # The docstore is a pickle written by create_vector_store
+            self.vector_store = FAISS.load_local(
+                str(self.persist_dir),
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+                normalize_L2=self.quantize_vectors
+            )
+            self.vector_store.index.hnsw.efSearch = HNSW_EF_SEARCH
+        else:
+            self.vector_store = Chroma(
+                persist_directory=str(self.persist_dir),
+                embedding_function=self.embeddings
+            )
         
         logger.info("Loaded vector store")
     
+    def _get_query_cache(self) -> Any:
+        """
+        Get the Chroma collection used as a semantic cache of query responses
+        
+        Returns:
+            Query cache collection
+        """
+        if self._query_cache is None:
+            client = chromadb.PersistentClient(path=str(self.persist_dir / "query_cache"))
+            self._query_cache = client.get_or_create_collection(
+                name="query_cache",
+                metadata={"hnsw:space": "cosine"}
+            )
+        
+        return self._query_cache
+    
+    def clear_query_cache(self) -> None:
+        """
+        Remove all cached query responses
+        """
+        logger.info("Clearing query cache")
+        
+        query_cache = self._get_query_cache()
+        cached_ids = query_cache.get(include=[])["ids"]
+        if cached_ids:
+            query_cache.delete(ids=cached_ids)
+    
     def setup(self, force_reload: bool = False) -> None:
         """
         Set up the RAG system
         
+        An existing vector store is loaded and updated with the files that
+        changed since it was built.
+        
         Args:
             force_reload: Whether to force reload the vector store
         """
@@ -194,14 +680,34 @@ class RAGAgentSystem:
         if not force_reload and self.persist_dir.exists():
             logger.info("Vector store already exists, loading it")
             self.load_vector_store()
+            
+            if (self.persist_dir / MANIFEST_FILE).exists():
+                self.update_vector_store()
+            else:
+                logger.warning("Vector store has no manifest and cannot be updated, use force_reload to rebuild it")
         else:
             logger.info("Creating new vector store")
-            # Load and process documents
-            documents = self.load_documents()
-            chunks = self.process_documents(documents)
-            
-            # Create vector store
-            self.create_vector_store(chunks)
+            files = self._source_files()
+            self._rebuild_vector_store({path: self._file_hash(path) for path in files})
+    
+    def _rebuild_vector_store(self, file_hashes: Dict[str, str]) -> None:
+        """
+        Create the vector store from scratch and write its manifest
+        
+        Args:
+            file_hashes: Content hash by source file to index
+        """
+        # Load and process documents
+        documents = self.load_documents(list(file_hashes))
+        chunks = self.process_documents(documents)
+        
+        # Create vector store
+        ids_by_source = self.create_vector_store(chunks)
+        
+        self._write_manifest({
+            path: {"hash": file_hash, "ids": ids_by_source.get(path, [])}
+            for path, file_hash in file_hashes.items()
+        })
     
     def create_agents(self) -> Dict[str, Agent]:
         """
@@ -254,13 +760,18 @@ class RAGAgentSystem:
             "validator": validator_agent
         }
     
-    def create_tasks(self, agents: Dict[str, Agent], query: str) -> List[Task]:
+    def create_tasks(self, agents: Dict[str, Agent]) -> List[Task]:
         """
         Create tasks for the AI agents
         
+        The task descriptions contain a {query} placeholder that CrewAI fills
+        in from the kickoff inputs, so the tasks can be reused across
+        queries. The query is placed at the end of each task description so
+        the static instructions form a prefix that is identical across
+        queries and can be served from the LLM provider's prompt cache.
+        
         Args:
             agents: Dictionary of agents
-            query: User query
             
         Returns:
             List of tasks
@@ -269,11 +780,11 @@ class RAGAgentSystem:
         
         # Create retrieval task
         retrieval_task = Task(
-            description=f"""
-            Retrieve the most relevant information from the knowledge base to answer the following question:
-            {query}
-            
+            description="""
+            Retrieve the most relevant information from the knowledge base to answer the question below.
             Use the vector store to find the most relevant documents.
+            
+            Question: {query}
             """,
             expected_output="A comprehensive set of relevant information from the knowledge base",
             agent=agents["retriever"]
@@ -281,11 +792,11 @@ class RAGAgentSystem:
         
         # Create analysis task
         analysis_task = Task(
-            description=f"""
-            Analyze the retrieved information and provide an accurate answer to the following question:
-            {query}
-            
+            description="""
+            Analyze the retrieved information and provide an accurate answer to the question below.
             Use the information provided by the retriever to formulate a comprehensive answer.
+            
+            Question: {query}
             """,
             expected_output="A comprehensive and accurate answer to the question",
             agent=agents["analyzer"],
@@ -294,12 +805,12 @@ class RAGAgentSystem:
         
         # Create validation task
         validation_task = Task(
-            description=f"""
-            Validate the accuracy of the answer provided by the analyzer for the following question:
-            {query}
-            
+            description="""
+            Validate the accuracy of the answer provided by the analyzer for the question below.
             Check if the answer is correct, complete, and addresses all aspects of the question.
             If there are any issues, provide corrections or additional information.
+            
+            Question: {query}
             """,
             expected_output="A validated and potentially enhanced answer to the question",
             agent=agents["validator"],
@@ -308,10 +819,41 @@ class RAGAgentSystem:
         
         return [retrieval_task, analysis_task, validation_task]
     
+    def _get_crew(self) -> Crew:
+        """
+        Get the agent crew of the current thread
+        
+        Returns:
+            Crew running the retrieval, analysis and validation tasks
+        """
+        crew = getattr(self._crews, "crew", None)
+        
+        if crew is None:
+            # Create agents
+            agents = self.create_agents()
+            
+            # Create tasks
+            tasks = self.create_tasks(agents)
+            
+            # Create crew
+            crew = Crew(
+                agents=list(agents.values()),
+                tasks=tasks,
+                verbose=True,
+                process=Process.sequential
+            )
+            self._crews.crew = crew
+        
+        return crew
+    
     def query(self, query: str) -> str:
         """
         Query the RAG system
         
+        The query is answered by a single retrieval chain call. The agent
+        crew only runs when that answer is not backed by RETRIEVAL_K
+        documents or reads as uncertain.
+        
         Args:
             query: User query
             
@@ -325,33 +867,61 @@ class RAGAgentSystem:
             logger.error("Vector store not initialized, call setup() first")
             return "Error: Vector store not initialized"
         
-        # Create a simple retrieval chain for the retriever agent to use
-        retrieval_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vector_store.as_retriever(
-                search_kwargs={"k": 5}
-            ),
-            return_source_documents=True,
-            verbose=True
-        )
-        
-        # Create agents
-        agents = self.create_agents()
-        
-        # Create tasks
-        tasks = self.create_tasks(agents, query)
-        
-        # Create crew
-        crew = Crew(
-            agents=list(agents.values()),
-            tasks=tasks,
-            verbose=True,
-            process=Process.sequential
-        )
+        # Return the cached response of a near-identical earlier query
+        if self.query_cache_threshold is not None:
+            query_embedding = self.embeddings.embed_query(query)
+            query_cache = self._get_query_cache()
+            
+            if query_cache.count() > 0:
+                matches = query_cache.query(
+                    query_embeddings=[query_embedding],
+                    n_results=1,
+                    include=["metadatas", "distances"]
+                )
+                
+                # Cosine distance is 1 - cosine similarity
+                if matches["ids"][0] and 1 - matches["distances"][0][0] >= self.query_cache_threshold:
+                    logger.info("Returning cached response")
+                    return matches["metadatas"][0][0]["response"]
+        
+        # Create a simple retrieval chain once per vector store
+        if self._retrieval_chain is None:
+            self._retrieval_chain = RetrievalQA.from_chain_type(
+                llm=self.llm,
+                chain_type="stuff",
+                retriever=self.vector_store.as_retriever(
+                    search_kwargs={"k": RETRIEVAL_K}
+                ),
+                return_source_documents=True,
+                verbose=True
+            )
         
-        # Execute crew
-        result = crew.kickoff()
+        # Answer directly from the retrieved documents when the answer is
+        # backed by a full set of documents and does not hedge
+        retrieval_result = self._retrieval_chain.invoke({"query": query})
+        answer = retrieval_result["result"].strip()
+        
+        if (
+            answer
+            and len(retrieval_result["source_documents"]) >= RETRIEVAL_K
+            and not UNCERTAIN_ANSWER_PATTERN.search(answer)
+        ):
+            logger.info("Answered from retrieval chain")
+            result = answer
+        else:
+            logger.info("Retrieval answer not confident, running agent crew")
+            
+            # Execute crew
+            result = str(self._get_crew().kickoff(inputs={"query": query}))
+        
+        # Cache the response for similar queries
+        if self.query_cache_threshold is not None:
+            query_cache.upsert(
+                ids=[hashlib.sha256(query.encode("utf-8")).hexdigest()],
+                embeddings=[query_embedding],
+                documents=[query],
+                metadatas=[{"response": result}]
+            )
         
         logger.info(f"RAG system response: {result}")
         return result
@@ -366,8 +936,8 @@ def main():
         persist_dir="./chroma_db"
     )
     
-    # Set up RAG system
-    rag_system.setup(force_reload=True)
+    # Set up RAG system, only changed documents are re-embedded
+    rag_system.setup()
     
     # Query RAG system
     query = "What are the CPT codes for a routine physical examination?"
@@ -5,6 +5,7 @@ This script provides a command-line interface to interact with the RAG system.
 """
 
 import argparse
+import functools
 import logging
 import sys
 from pathlib import Path
@@ -53,6 +54,26 @@ def parse_args():
     
     return parser.parse_args()
 
+@functools.lru_cache(maxsize=None)
+def get_rag_system(data_dir: str, persist_dir: str) -> RAGAgentSystem:
+    """
+    Get the RAG system for a data and persist directory
+    
+    The system is created once per directory pair, loading the embedding
+    model is the most expensive part of startup.
+    
+    Args:
+        data_dir: Directory containing the data files
+        persist_dir: Directory to persist the vector store
+        
+    Returns:
+        RAG system
+    """
+    return RAGAgentSystem(
+        data_dir=data_dir,
+        persist_dir=persist_dir
+    )
+
 def setup_rag_system(args):
     """
     Set up the RAG system
@@ -63,10 +84,7 @@ def setup_rag_system(args):
     logger.info("Setting up RAG system")
     
     # Initialize RAG system
-    rag_system = RAGAgentSystem(
-        data_dir=args.data_dir,
-        persist_dir=args.persist_dir
-    )
+    rag_system = get_rag_system(args.data_dir, args.persist_dir)
     
     # Set up RAG system
     rag_system.setup(force_reload=args.force)
@@ -83,10 +101,7 @@ def query_rag_system(args):
     logger.info(f"Querying RAG system: {args.query}")
     
     # Initialize RAG system
-    rag_system = RAGAgentSystem(
-        data_dir=args.data_dir,
-        persist_dir=args.persist_dir
-    )
+    rag_system = get_rag_system(args.data_dir, args.persist_dir)
     
     # Set up RAG system
     rag_system.setup()
@@ -107,10 +122,7 @@ def run_interactive_mode(args):
     logger.info("Running RAG system in interactive mode")
     
     # Initialize RAG system
-    rag_system = RAGAgentSystem(
-        data_dir=args.data_dir,
-        persist_dir=args.persist_dir
-    )
+    rag_system = get_rag_system(args.data_dir, args.persist_dir)
     
     # Set up RAG system
     rag_system.setup()
@@ -144,10 +156,7 @@ def validate_rag_system(args):
     from validate_rag_system import RAGSystemValidator
     
     # Initialize RAG system
-    rag_system = RAGAgentSystem(
-        data_dir=args.data_dir,
-        persist_dir=args.persist_dir
-    )
+    rag_system = get_rag_system(args.data_dir, args.persist_dir)
     
     # Set up RAG system
     rag_system.setup()
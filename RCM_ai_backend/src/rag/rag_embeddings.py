@@ -0,0 +1,273 @@
+"""
+Embedding backends for the RAG system
+
+This module contains the LangChain embedding implementations used by the RAG
+system in addition to the stock HuggingFaceEmbeddings.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Open LMDB environments by path, an environment must not be opened twice
+# in the same process
+_lmdb_environments: Dict[str, object] = {}
+
+class AutocastHuggingFaceEmbeddings(HuggingFaceEmbeddings):
+    """
+    HuggingFace sentence embeddings encoded under CUDA FP16 autocast
+
+    Matrix multiplications run in half precision on tensor cores while
+    autocast keeps reductions such as the final normalization in float32.
+    Documents and queries are encoded the same way so their embeddings are
+    comparable.
+    """
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts under autocast
+
+        Args:
+            texts: Texts to encode
+
+        Returns:
+            float32 embeddings, one row per text
+        """
+        texts = [text.replace("\n", " ") for text in texts]
+
+        with torch.autocast(device_type="cuda", dtype=torch.float16):
+            embeddings = self.client.encode(
+                texts,
+                convert_to_numpy=True,
+                show_progress_bar=self.show_progress,
+                **self.encode_kwargs
+            )
+
+        # A half precision model returns float16 arrays
+        return embeddings.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents
+
+        Args:
+            texts: Documents to embed
+
+        Returns:
+            List of embeddings
+        """
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query
+
+        Args:
+            text: Query to embed
+
+        Returns:
+            Embedding
+        """
+        return self._encode([text])[0].tolist()
+
+class QuantizedONNXEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed by an int8-quantized ONNX Runtime model
+
+    On first use the HuggingFace model is exported to ONNX and dynamically
+    quantized with AVX512-VNNI int8 kernels. The quantized model is cached
+    in model_dir and reused afterwards.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        model_dir: str = "./onnx_models",
+        batch_size: int = 64
+    ):
+        """
+        Initialize the quantized embedding model
+
+        Args:
+            model_name: Name of the HuggingFace model to export
+            model_dir: Directory to cache the quantized model in
+            batch_size: Number of texts to run through the model at once
+        """
+        # Imported lazily, optimum is only needed for this backend
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        save_dir = Path(model_dir) / (model_name.replace("/", "__") + "-int8")
+
+        if not save_dir.exists():
+            logger.info(f"Exporting and quantizing {model_name} to {save_dir}")
+
+            # Export the model to ONNX
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+
+            # Quantize weights to int8, activations are quantized at runtime
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantization_config = AutoQuantizationConfig.avx512_vnni(
+                is_static=False,
+                per_channel=True
+            )
+            quantizer.quantize(save_dir=save_dir, quantization_config=quantization_config)
+
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(save_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            save_dir,
+            file_name="model_quantized.onnx"
+        )
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            L2-normalized mean-pooled embeddings, one row per text
+        """
+        # Tokenize the whole batch in a single call
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            return_tensors="np"
+        )
+
+        outputs = self.model(**inputs)
+        hidden_state = np.asarray(outputs.last_hidden_state, dtype=np.float32)
+
+        # Mean-pool over the non-padding tokens
+        mask = inputs["attention_mask"][..., np.newaxis].astype(np.float32)
+        pooled = (hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        # Normalize like the sentence-transformers pipeline does
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents
+
+        Args:
+            texts: Documents to embed
+
+        Returns:
+            List of embeddings
+        """
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._embed(texts[start:start + self.batch_size]).tolist())
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query
+
+        Args:
+            text: Query to embed
+
+        Returns:
+            Query embedding
+        """
+        return self._embed([text])[0].tolist()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Document embeddings memoized on disk by content hash
+
+    Embeddings are stored in an LMDB environment keyed by the SHA-1 of the
+    text. Only texts missing from the cache are passed to the wrapped
+    embeddings, in a single call. Query embeddings are not cached.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_dir: str = "./emb_cache",
+        namespace: str = "default",
+        map_size: int = 2 ** 34
+    ):
+        """
+        Initialize the embedding cache
+
+        Args:
+            embeddings: Embeddings to cache
+            cache_dir: Directory to store the cache in
+            namespace: Name of the cache, one per embedding model so vectors
+                of different models are never mixed
+            map_size: Maximum size of the cache in bytes
+        """
+        # Imported lazily, lmdb is only needed when caching is enabled
+        import lmdb
+
+        self.embeddings = embeddings
+
+        path = Path(cache_dir) / namespace.replace("/", "__")
+        path.mkdir(parents=True, exist_ok=True)
+
+        key = str(path.resolve())
+        if key not in _lmdb_environments:
+            _lmdb_environments[key] = lmdb.open(key, map_size=map_size)
+        self.env = _lmdb_environments[key]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents, reusing cached embeddings
+
+        Args:
+            texts: Documents to embed
+
+        Returns:
+            List of embeddings
+        """
+        keys = [hashlib.sha1(text.encode("utf-8")).digest() for text in texts]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        with self.env.begin() as txn:
+            for i, key in enumerate(keys):
+                value = txn.get(key)
+                if value is not None:
+                    embeddings[i] = np.frombuffer(value, dtype=np.float32).tolist()
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+
+            # Store all new embeddings in a single write transaction
+            with self.env.begin(write=True) as txn:
+                for i, embedding in zip(missing, computed):
+                    txn.put(keys[i], np.asarray(embedding, dtype=np.float32).tobytes())
+                    embeddings[i] = embedding
+
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query
+
+        Args:
+            text: Query to embed
+
+        Returns:
+            Query embedding
+        """
+        return self.embeddings.embed_query(text)
@@ -7,6 +7,8 @@ and evaluating the responses.
 
 import logging
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -25,7 +27,8 @@ class RAGSystemValidator:
         self,
         rag_system: RAGAgentSystem,
         test_queries_file: str = "test_queries.json",
-        results_file: str = "validation_results.json"
+        results_file: str = "validation_results.json",
+        max_workers: int = 8
     ):
         """
         Initialize the validator
@@ -34,10 +37,12 @@ class RAGSystemValidator:
             rag_system: RAG system to validate
             test_queries_file: File containing test queries
             results_file: File to write validation results to
+            max_workers: Number of test queries to run concurrently
         """
         self.rag_system = rag_system
         self.test_queries_file = Path(test_queries_file)
         self.results_file = Path(results_file)
+        self.max_workers = max_workers
         
         # Create default test queries if file doesn't exist
         if not self.test_queries_file.exists():
@@ -107,11 +112,20 @@ class RAGSystemValidator:
         # Convert response to lowercase for case-insensitive matching
         response_lower = response.lower()
         
+        # Find all keyword occurrences in a single pass. The lookahead lets
+        # matches overlap and longer keywords are tried first, so a keyword
+        # occurs in the response exactly when it is part of some match.
+        keywords_lower = sorted({keyword.lower() for keyword in expected_keywords}, key=len, reverse=True)
+        found = set()
+        if keywords_lower:
+            pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in keywords_lower) + "))")
+            found = set(pattern.findall(response_lower))
+        
         # Check if each expected keyword is in the response
-        keyword_results = {}
-        for keyword in expected_keywords:
-            keyword_lower = keyword.lower()
-            keyword_results[keyword] = keyword_lower in response_lower
+        keyword_results = {
+            keyword: any(keyword.lower() in match for match in found)
+            for keyword in expected_keywords
+        }
         
         # Calculate overall score
         keywords_found = sum(1 for result in keyword_results.values() if result)
@@ -125,6 +139,34 @@ class RAGSystemValidator:
             "score": score
         }
     
+    def run_test_query(self, test_query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a single test query and evaluate the response
+        
+        Args:
+            test_query: Test query with its expected keywords
+            
+        Returns:
+            Test query result
+        """
+        query = test_query["query"]
+        expected_keywords = test_query["expected_keywords"]
+        
+        logger.info(f"Running test query: {query}")
+        
+        # Query RAG system
+        response = self.rag_system.query(query)
+        
+        # Evaluate response
+        evaluation = self.evaluate_response(response, expected_keywords)
+        
+        return {
+            "query": query,
+            "response": response,
+            "expected_keywords": expected_keywords,
+            "evaluation": evaluation
+        }
+    
     def validate(self) -> Dict[str, Any]:
         """
         Validate the RAG system
@@ -137,27 +179,10 @@ class RAGSystemValidator:
         # Load test queries
         test_queries = self.load_test_queries()
         
-        # Run test queries
-        results = []
-        for test_query in test_queries:
-            query = test_query["query"]
-            expected_keywords = test_query["expected_keywords"]
-            
-            logger.info(f"Running test query: {query}")
-            
-            # Query RAG system
-            response = self.rag_system.query(query)
-            
-            # Evaluate response
-            evaluation = self.evaluate_response(response, expected_keywords)
-            
-            # Add to results
-            results.append({
-                "query": query,
-                "response": response,
-                "expected_keywords": expected_keywords,
-                "evaluation": evaluation
-            })
+        # Run test queries concurrently, they are independent and mostly
+        # wait on the LLM
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self.run_test_query, test_queries))
         
         # Calculate overall score
         overall_score = sum(result["evaluation"]["score"] for result in results) / len(results) if results else 0
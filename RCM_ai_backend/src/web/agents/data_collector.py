@@ -1,33 +1,29 @@
 import os
 import re
+import io
 import json
-import pandas as pd
+import mmap
+import atexit
+import hashlib
+import orjson
+import asyncio
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Any, Optional
+from datetime import date, datetime
 
-# CrewAI imports
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
+# LangChain tool decorator, CrewAI and the LLM client are imported when the
+# crew is built
 from langchain.tools import tool
 
-# Django imports
-import django
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
-django.setup()
-
-from main.models import Patient, ClinicalNote, Diagnosis, Procedure, ProcessedDocument
-
-# Medical data processing imports
-import spacy
-import pytesseract
-from PIL import Image
-from fhir.resources.patient import Patient as FHIRPatient
-from fhir.resources.condition import Condition as FHIRCondition
-from fhir.resources.procedure import Procedure as FHIRProcedure
-from hl7apy.parser import parse_message
+# Medical data processing imports. spaCy, OCR, FHIR and HL7 libraries are
+# imported by the tools that need them, so a run only pays for the formats
+# it actually touches.
+import ahocorasick
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -35,28 +31,456 @@ from dotenv import load_dotenv
 # Load from .env file
 load_dotenv()
 
-# Check if API key exists and prompt if it doesn't
-if not os.environ.get("OPENAI_API_KEY"):
-    print("ERROR: OPENAI_API_KEY not found in environment variables or .env file")
-    api_key = input("Please enter your OpenAI API key: ")
-    os.environ["OPENAI_API_KEY"] = api_key
-    print("API key set for this session. For future runs, please add it to your .env file.")
-
-# Initialize LLM with explicit API key
-llm = ChatOpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-    model="gpt-3.5-turbo",
-    temperature=0,
+@functools.lru_cache(maxsize=1)
+def _setup_django() -> None:
+    """
+    Configure Django so the main app's models can be imported.
+    """
+    import django
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+def ensure_api_key() -> None:
+    """
+    Prompt for the OpenAI API key if it is not set.
+    
+    Must run in the main process, before worker processes are started, so
+    that they inherit the key through the environment.
+    """
+    # Check if API key exists and prompt if it doesn't
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("ERROR: OPENAI_API_KEY not found in environment variables or .env file")
+        api_key = input("Please enter your OpenAI API key: ")
+        os.environ["OPENAI_API_KEY"] = api_key
+        print("API key set for this session. For future runs, please add it to your .env file.")
+
+@functools.lru_cache(maxsize=1)
+def _get_llm():
+    """
+    Create the LLM shared by all agents.
+    
+    Returns:
+        ChatOpenAI client
+    """
+    from langchain_openai import ChatOpenAI
+    
+    # Worker processes have no usable stdin, the key is prompted for by
+    # ensure_api_key() in the main process before any worker starts
+    if not os.environ.get("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY not found in environment variables or .env file")
+    
+    # Initialize LLM with explicit API key
+    return ChatOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        model="gpt-3.5-turbo",
+        temperature=0,
+    )
+
+# spaCy model used for entity recognition. Word vectors are never used, so
+# the small model is sufficient.
+SPACY_MODEL = "en_core_web_sm"
+
+# Pipeline components not needed for entity recognition. Only doc.ents is
+# used, so these are excluded rather than loaded and skipped. The shared
+# tok2vec only feeds the tagger and parser, NER has its own.
+SPACY_EXCLUDE = ["tok2vec", "parser", "lemmatizer", "attribute_ruler", "tagger", "senter"]
+
+@functools.lru_cache(maxsize=1)
+def _nlp():
+    """
+    Load the spaCy pipeline on first use.
+    
+    Returns:
+        spaCy pipeline
+    """
+    import spacy
+    
+    # Initialize NLP model
+    try:
+        nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    except OSError:
+        # If model not found, download it
+        import subprocess
+        subprocess.run(["python", "-m", "spacy", "download", SPACY_MODEL])
+        nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    
+    # Warm up the pipeline so the first real document doesn't pay for it
+    nlp("")
+    return nlp
+
+# Maximum number of parsed FHIR resources kept in memory
+FHIR_CACHE_SIZE = 4096
+
+# Parsed FHIR resources by (content digest, resource type), least recently
+# used first
+_fhir_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_fhir_cache_lock = threading.Lock()
+
+# JSON files at least this large are parsed from a memory map instead of
+# being read into memory first
+JSON_MMAP_MIN_SIZE = 64 * 1024
+
+def _load_json(file_path: str) -> Any:
+    """
+    Load a JSON file with orjson.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        Parsed JSON
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < JSON_MMAP_MIN_SIZE:
+            return orjson.loads(f.read())
+        
+        # Parse directly from the page cache for large files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+def _parse_fhir(fhir_json: Dict[str, Any], model):
+    """
+    Parse a FHIR resource, reusing the model of an identical earlier resource.
+    
+    Args:
+        fhir_json: FHIR resource as a dictionary
+        model: fhir.resources model class to parse it with
+        
+    Returns:
+        Parsed FHIR resource
+    """
+    # Key on a digest of the canonical JSON rather than the JSON itself
+    canonical_json = orjson.dumps(fhir_json, option=orjson.OPT_SORT_KEYS)
+    key = (hashlib.blake2b(canonical_json, digest_size=16).digest(), model.__name__)
+    
+    with _fhir_cache_lock:
+        resource = _fhir_cache.get(key)
+        if resource is not None:
+            _fhir_cache.move_to_end(key)
+            return resource
+    
+    resource = model.parse_obj(fhir_json)
+    
+    with _fhir_cache_lock:
+        _fhir_cache[key] = resource
+        while len(_fhir_cache) > FHIR_CACHE_SIZE:
+            _fhir_cache.popitem(last=False)
+    
+    return resource
+
+# Maximum number of Tesseract processes running at once
+OCR_CONCURRENCY = int(os.environ.get("OCR_CONCURRENCY", os.cpu_count() or 1))
+
+# OCR implementation: "aiopytesseract" runs a Tesseract process per page,
+# "tesserocr" keeps one in-process Tesseract instance per thread
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "aiopytesseract")
+
+# Tesseract instances of the tesserocr backend, one per thread. Every
+# instance is also tracked so it can be freed at exit.
+_tesseract = threading.local()
+_tesseract_apis = []
+_tesseract_apis_lock = threading.Lock()
+
+# Pages with fewer characters of embedded text than this are OCRed
+PDF_TEXT_MIN_CHARS = 50
+
+# Resolution PDF pages are rendered at for OCR
+PDF_OCR_DPI = 200
+
+async def _ocr_images(images: List[bytes]) -> List[str]:
+    """
+    Run OCR on images concurrently.
+    
+    Args:
+        images: PNG encoded images to process
+        
+    Returns:
+        Extracted text for each image, in order
+    """
+    import aiopytesseract
+    
+    semaphore = asyncio.Semaphore(OCR_CONCURRENCY)
+    
+    async def ocr_image(image: bytes) -> str:
+        async with semaphore:
+            return await aiopytesseract.image_to_string(image)
+    
+    return await asyncio.gather(*(ocr_image(image) for image in images))
+
+def _tesserocr_image(image: bytes) -> str:
+    """
+    Run OCR on an image with this thread's tesserocr instance.
+    
+    Args:
+        image: PNG encoded image to process
+        
+    Returns:
+        Extracted text
+    """
+    from PIL import Image
+    
+    api = getattr(_tesseract, 'api', None)
+    if api is None:
+        import tesserocr
+        api = _tesseract.api = tesserocr.PyTessBaseAPI(lang='eng')
+        with _tesseract_apis_lock:
+            _tesseract_apis.append(api)
+    
+    api.SetImage(Image.open(io.BytesIO(image)))
+    return api.GetUTF8Text()
+
+@functools.lru_cache(maxsize=1)
+def _ocr_executor() -> ThreadPoolExecutor:
+    """
+    Create the thread pool of the tesserocr backend.
+    
+    The pool lives as long as the process, so its threads and their
+    Tesseract instances are reused by every PDF instead of being loaded
+    again for each one.
+    
+    Returns:
+        Executor with OCR_CONCURRENCY threads
+    """
+    atexit.register(_shutdown_ocr)
+    return ThreadPoolExecutor(max_workers=OCR_CONCURRENCY, thread_name_prefix="ocr")
+
+def _shutdown_ocr() -> None:
+    """
+    Stop the tesserocr thread pool and free its Tesseract instances.
+    """
+    _ocr_executor().shutdown(wait=True)
+    with _tesseract_apis_lock:
+        for api in _tesseract_apis:
+            api.End()
+        _tesseract_apis.clear()
+
+def _ocr_pages(images: List[bytes]) -> List[str]:
+    """
+    Run OCR on images with the configured OCR backend.
+    
+    Args:
+        images: PNG encoded images to process
+        
+    Returns:
+        Extracted text for each image, in order
+    """
+    if OCR_BACKEND == "tesserocr":
+        # tesserocr releases the GIL while recognizing, so threads run in parallel
+        return list(_ocr_executor().map(_tesserocr_image, images))
+    
+    return asyncio.run(_ocr_images(images))
+
+# Common medical abbreviations, shared by all normalization tools
+_ABBREVIATIONS = MappingProxyType({
+    'HTN': 'Hypertension',
+    'DM': 'Diabetes Mellitus',
+    'COPD': 'Chronic Obstructive Pulmonary Disease',
+    'CHF': 'Congestive Heart Failure',
+    'CAD': 'Coronary Artery Disease',
+    'MI': 'Myocardial Infarction',
+    'CVA': 'Cerebrovascular Accident',
+    'UTI': 'Urinary Tract Infection',
+    'URI': 'Upper Respiratory Infection',
+    'LBP': 'Low Back Pain',
+    'Hx': 'History',
+    'Dx': 'Diagnosis',
+    'Tx': 'Treatment',
+    'Fx': 'Fracture',
+    'Sx': 'Symptoms',
+    'Pt': 'Patient',
+    'yo': 'year old',
+    'y/o': 'year old',
+    'b/l': 'bilateral',
+    'w/': 'with',
+    'w/o': 'without',
+    's/p': 'status post',
+    'c/o': 'complains of',
+    'h/o': 'history of'
+})
+
+# Abbreviation lookup by lowercased abbreviation
+_ABBREVIATIONS_BY_LOWER = MappingProxyType({abbr.lower(): expansion for abbr, expansion in _ABBREVIATIONS.items()})
+
+# Matches any abbreviation as a whole word. Longer abbreviations come first
+# so that e.g. 'w/o' is not matched as 'w/'.
+_ABBREVIATION_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(re.escape(abbr) for abbr in sorted(_ABBREVIATIONS, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
 )
 
-# Initialize NLP model
-try:
-    nlp = spacy.load("en_core_web_md")
-except OSError:
-    # If model not found, download it
-    import subprocess
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_md"])
-    nlp = spacy.load("en_core_web_md")
+# Simplified mapping of common diagnoses to ICD-10 codes
+_ICD10_MAPPING = {
+    'hypertension': 'I10',
+    'diabetes': 'E11.9',
+    'diabetes mellitus': 'E11.9',
+    'type 2 diabetes': 'E11.9',
+    'asthma': 'J45.909',
+    'pneumonia': 'J18.9',
+    'urinary tract infection': 'N39.0',
+    'uti': 'N39.0',
+    'acute bronchitis': 'J20.9',
+    'bronchitis': 'J20.9',
+    'depression': 'F32.9',
+    'anxiety': 'F41.9',
+    'gerd': 'K21.9',
+    'gastroesophageal reflux disease': 'K21.9',
+    'congestive heart failure': 'I50.9',
+    'chf': 'I50.9',
+    'coronary artery disease': 'I25.10',
+    'cad': 'I25.10'
+}
+
+# Simplified mapping of common procedures to CPT codes
+_CPT_MAPPING = {
+    'office visit': '99213',
+    'chest x-ray': '71045',
+    'echocardiogram': '93306',
+    'colonoscopy': '45378',
+    'upper endoscopy': '43235',
+    'mri brain': '70553',
+    'ct scan abdomen': '74177',
+    'complete blood count': '85025',
+    'cbc': '85025',
+    'comprehensive metabolic panel': '80053',
+    'cmp': '80053',
+    'lipid panel': '80061',
+    'flu vaccine': '90688',
+    'influenza vaccine': '90688'
+}
+
+def _build_automaton(mapping: Dict[str, str]) -> ahocorasick.Automaton:
+    """
+    Build an Aho-Corasick automaton matching all terms of a code mapping.
+    
+    Args:
+        mapping: Mapping of lowercase terms to codes
+        
+    Returns:
+        Automaton yielding (term length, code) for each matched term
+    """
+    automaton = ahocorasick.Automaton()
+    for term, code in mapping.items():
+        automaton.add_word(term, (len(term), code))
+    automaton.make_automaton()
+    return automaton
+
+_ICD10_AUTOMATON = _build_automaton(_ICD10_MAPPING)
+_CPT_AUTOMATON = _build_automaton(_CPT_MAPPING)
+
+def _longest_match(automaton: ahocorasick.Automaton, description: str) -> Optional[str]:
+    """
+    Find the code of the longest mapping term contained in a description.
+    
+    Args:
+        automaton: Automaton built by _build_automaton
+        description: Description to search
+        
+    Returns:
+        Code of the longest matching term, or None if no term matches
+    """
+    best = None
+    for _, match in automaton.iter(description.lower()):
+        if best is None or match[0] > best[0]:
+            best = match
+    return best[1] if best else None
+
+# Clinical note section patterns, compiled once at import
+_SECTION_PATTERNS = [
+    (re.compile(r'history of present illness:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', re.IGNORECASE), 'history_of_present_illness'),
+    (re.compile(r'past medical history:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', re.IGNORECASE), 'past_medical_history'),
+    (re.compile(r'medications:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', re.IGNORECASE), 'medications'),
+    (re.compile(r'assessment:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', re.IGNORECASE), 'assessment'),
+    (re.compile(r'plan:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', re.IGNORECASE), 'plan')
+]
+
+# Diagnosis line patterns (simplified)
+_DIAGNOSIS_PATTERNS = [
+    re.compile(r'diagnosis:?\s*(.*?)(?=\n|$)', re.IGNORECASE),
+    re.compile(r'assessment:?\s*(.*?)(?=\n|$)', re.IGNORECASE),
+    re.compile(r'impression:?\s*(.*?)(?=\n|$)', re.IGNORECASE),
+    re.compile(r'dx:?\s*(.*?)(?=\n|$)', re.IGNORECASE)
+]
+
+# Procedure line patterns (simplified)
+_PROCEDURE_PATTERNS = [
+    re.compile(r'procedure:?\s*(.*?)(?=\n|$)', re.IGNORECASE),
+    re.compile(r'operation:?\s*(.*?)(?=\n|$)', re.IGNORECASE),
+    re.compile(r'performed:?\s*(.*?)(?=\n|$)', re.IGNORECASE)
+]
+
+# HL7 segment terminators, '\r' by the standard but files often use newlines
+_HL7_SEGMENT_SEPARATOR = re.compile(r'\r\n|\r|\n')
+
+def _split_hl7_message(hl7_content: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract patient, diagnosis and procedure data from an HL7 v2 message by
+    splitting its PID, DG1 and PR1 segments on the message delimiters.
+    
+    Args:
+        hl7_content: HL7 message in ER7 encoding
+        
+    Returns:
+        Extracted data in the same format as extract_from_hl7, or None if the
+        message has no MSH or PID segment
+    """
+    segments = [segment for segment in _HL7_SEGMENT_SEPARATOR.split(hl7_content.strip()) if segment]
+    if not segments or not segments[0].startswith('MSH') or len(segments[0]) < 5:
+        return None
+    
+    # Delimiters are declared by the message header
+    field_separator = segments[0][3]
+    component_separator = segments[0][4]
+    repetition_separator = segments[0][5] if len(segments[0]) > 5 else '~'
+    
+    def field(fields: List[str], index: int) -> str:
+        value = fields[index] if index < len(fields) else ''
+        return value.split(repetition_separator, 1)[0]
+    
+    def component(fields: List[str], index: int, position: int = 0) -> str:
+        components = field(fields, index).split(component_separator)
+        return components[position] if position < len(components) else ''
+    
+    patient_data = None
+    diagnoses = []
+    procedures = []
+    
+    for segment in segments[1:]:
+        fields = segment.split(field_separator)
+        segment_type = fields[0]
+        
+        if segment_type == 'PID' and patient_data is None:
+            patient_data = {
+                'patient_id': component(fields, 2),
+                'first_name': component(fields, 5, 1),
+                'last_name': component(fields, 5, 0),
+                'date_of_birth': field(fields, 7),
+                'gender': field(fields, 8),
+            }
+        elif segment_type == 'DG1':
+            diagnoses.append({
+                'icd_code': component(fields, 3),
+                'description': field(fields, 4),
+                'diagnosis_date': field(fields, 5)
+            })
+        elif segment_type == 'PR1':
+            procedures.append({
+                'cpt_code': component(fields, 3),
+                'description': field(fields, 4),
+                'procedure_date': field(fields, 5)
+            })
+    
+    if patient_data is None:
+        return None
+    
+    return {
+        'patient': patient_data,
+        'diagnoses': diagnoses,
+        'procedures': procedures,
+        'document_type': 'HL7'
+    }
 
 # Define standalone tool functions outside the class
 @tool
@@ -74,7 +498,14 @@ def extract_from_hl7(file_path: str) -> Dict[str, Any]:
         with open(file_path, 'r') as f:
             hl7_content = f.read()
         
+        # Read the few segments needed by splitting the message directly,
+        # only fall back to the full hl7apy parser if that fails
+        extracted = _split_hl7_message(hl7_content)
+        if extracted is not None:
+            return extracted
+        
         # Parse HL7 message
+        from hl7apy.parser import parse_message
         message = parse_message(hl7_content)
         
         # Extract patient data
@@ -128,23 +559,21 @@ def extract_from_fhir(file_path: str) -> Dict[str, Any]:
         Extracted patient data
     """
     try:
-        with open(file_path, 'r') as f:
-            fhir_json = json.load(f)
+        fhir_json = _load_json(file_path)
         
         # Process based on resource type
         resource_type = fhir_json.get('resourceType')
         
         if resource_type == 'Patient':
-            patient = FHIRPatient.parse_obj(fhir_json)
-            
-            # Extract patient data
-            name = patient.name[0] if patient.name else None
+            # Only a handful of fields are needed, read them straight from
+            # the JSON instead of validating the whole resource
+            name = (fhir_json.get('name') or [{}])[0]
             patient_data = {
-                'patient_id': patient.id,
-                'first_name': name.given[0] if name and name.given else '',
-                'last_name': name.family if name and name.family else '',
-                'date_of_birth': patient.birthDate.isostring() if patient.birthDate else None,
-                'gender': patient.gender if patient.gender else ''
+                'patient_id': fhir_json.get('id'),
+                'first_name': (name.get('given') or [''])[0],
+                'last_name': name.get('family') or '',
+                'date_of_birth': fhir_json.get('birthDate'),
+                'gender': fhir_json.get('gender') or ''
             }
             
             return {
@@ -153,7 +582,8 @@ def extract_from_fhir(file_path: str) -> Dict[str, Any]:
             }
         
         elif resource_type == 'Condition':
-            condition = FHIRCondition.parse_obj(fhir_json)
+            from fhir.resources.condition import Condition as FHIRCondition
+            condition = _parse_fhir(fhir_json, FHIRCondition)
             
             # Extract diagnosis data
             diagnosis = {
@@ -169,7 +599,8 @@ def extract_from_fhir(file_path: str) -> Dict[str, Any]:
             }
         
         elif resource_type == 'Procedure':
-            procedure = FHIRProcedure.parse_obj(fhir_json)
+            from fhir.resources.procedure import Procedure as FHIRProcedure
+            procedure = _parse_fhir(fhir_json, FHIRProcedure)
             
             # Extract procedure data
             proc_data = {
@@ -202,16 +633,20 @@ def extract_from_pdf(file_path: str) -> Dict[str, Any]:
         Extracted text content
     """
     try:
-        # For simplicity, we'll use pytesseract to extract text from PDF
-        # In a real implementation, you would use a PDF library like PyPDF2 or pdfminer
-        # and only use OCR when needed
+        import fitz
         
-        # Convert PDF to image (simplified for demonstration)
-        # In a real implementation, you would use a library like pdf2image
-        image = Image.open(file_path)
+        with fitz.open(file_path) as pdf:
+            # Use the embedded text layer where there is one
+            pages = [page.get_text("text") for page in pdf]
+            
+            # Render the pages without usable text and OCR them concurrently
+            scanned = [i for i, page_text in enumerate(pages) if len(page_text.strip()) < PDF_TEXT_MIN_CHARS]
+            if scanned:
+                images = [pdf[i].get_pixmap(dpi=PDF_OCR_DPI).tobytes("png") for i in scanned]
+                for i, page_text in zip(scanned, _ocr_pages(images)):
+                    pages[i] = page_text
         
-        # Extract text using OCR
-        text = pytesseract.image_to_string(image)
+        text = "\n".join(pages)
         
         return {
             'content': text,
@@ -233,8 +668,19 @@ def extract_from_text(file_path: str) -> Dict[str, Any]:
         Extracted text content
     """
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
+        with open(file_path, 'rb') as f:
+            # Empty files cannot be memory-mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                content = ''
+            else:
+                # Decode straight from the page cache instead of reading
+                # the file into an intermediate buffer first
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    content = str(mm, 'utf-8', 'ignore')
+        
+        # Normalize line endings like text mode reads do
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
         
         return {
             'content': content,
@@ -254,34 +700,27 @@ def process_clinical_text(text: str) -> Dict[str, Any]:
         text: Clinical text to process
         
     Returns:
-        Structured information extracted from the text
+        Structured information extracted from the text. Entities are returned
+        as parallel lists under 'text', 'label', 'start' and 'end'.
     """
     # Process the text with spaCy
-    doc = nlp(text)
+    doc = _nlp()(text)
     
-    # Extract basic entities
-    entities = [
-        {
-            'text': ent.text,
-            'label': ent.label_,
-            'start': ent.start_char,
-            'end': ent.end_char
-        }
-        for ent in doc.ents
-    ]
+    # Extract basic entities as parallel lists, one per attribute
+    texts, labels, starts, ends = tuple(zip(
+        *((ent.text, ent.label_, ent.start_char, ent.end_char) for ent in doc.ents)
+    )) or ((), (), (), ())
+    entities = {
+        'text': list(texts),
+        'label': list(labels),
+        'start': list(starts),
+        'end': list(ends)
+    }
     
     # Extract sections using regex patterns (simplified)
     sections = {}
-    section_patterns = [
-        (r'(?i)history of present illness:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', 'history_of_present_illness'),
-        (r'(?i)past medical history:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', 'past_medical_history'),
-        (r'(?i)medications:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', 'medications'),
-        (r'(?i)assessment:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', 'assessment'),
-        (r'(?i)plan:?(.*?)(?=\n\s*\n|\n\s*[A-Z]|$)', 'plan')
-    ]
-    
-    for pattern, section_name in section_patterns:
-        matches = re.search(pattern, text)
+    for pattern, section_name in _SECTION_PATTERNS:
+        matches = pattern.search(text)
         if matches:
             sections[section_name] = matches.group(1).strip()
     
@@ -301,20 +740,10 @@ def extract_medical_entities(text: str) -> Dict[str, List[Dict[str, Any]]]:
     Returns:
         Extracted medical entities
     """
-    # Process the text with spaCy
-    doc = nlp(text)
-    
     # Extract diagnoses using pattern matching (simplified)
     diagnoses = []
-    diagnosis_patterns = [
-        r'(?i)diagnosis:?\s*(.*?)(?=\n|$)',
-        r'(?i)assessment:?\s*(.*?)(?=\n|$)',
-        r'(?i)impression:?\s*(.*?)(?=\n|$)',
-        r'(?i)dx:?\s*(.*?)(?=\n|$)'
-    ]
-    
-    for pattern in diagnosis_patterns:
-        matches = re.finditer(pattern, text)
+    for pattern in _DIAGNOSIS_PATTERNS:
+        matches = pattern.finditer(text)
         for match in matches:
             diagnoses.append({
                 'description': match.group(1).strip(),
@@ -323,14 +752,8 @@ def extract_medical_entities(text: str) -> Dict[str, List[Dict[str, Any]]]:
     
     # Extract procedures using pattern matching (simplified)
     procedures = []
-    procedure_patterns = [
-        r'(?i)procedure:?\s*(.*?)(?=\n|$)',
-        r'(?i)operation:?\s*(.*?)(?=\n|$)',
-        r'(?i)performed:?\s*(.*?)(?=\n|$)'
-    ]
-    
-    for pattern in procedure_patterns:
-        matches = re.finditer(pattern, text)
+    for pattern in _PROCEDURE_PATTERNS:
+        matches = pattern.finditer(text)
         for match in matches:
             procedures.append({
                 'description': match.group(1).strip(),
@@ -353,34 +776,13 @@ def normalize_medical_terms(terms: List[str]) -> List[Dict[str, str]]:
     Returns:
         Normalized terms
     """
-    # Common medical abbreviations (simplified)
-    abbreviations = {
-        'HTN': 'Hypertension',
-        'DM': 'Diabetes Mellitus',
-        'COPD': 'Chronic Obstructive Pulmonary Disease',
-        'CHF': 'Congestive Heart Failure',
-        'CAD': 'Coronary Artery Disease',
-        'MI': 'Myocardial Infarction',
-        'CVA': 'Cerebrovascular Accident',
-        'UTI': 'Urinary Tract Infection',
-        'URI': 'Upper Respiratory Infection',
-        'LBP': 'Low Back Pain'
-    }
-    
-    normalized_terms = []
-    for term in terms:
-        normalized = term
-        
-        # Check if term is an abbreviation
-        if term.upper() in abbreviations:
-            normalized = abbreviations[term.upper()]
-        
-        normalized_terms.append({
+    return [
+        {
             'original': term,
-            'normalized': normalized
-        })
-    
-    return normalized_terms
+            'normalized': _ABBREVIATIONS_BY_LOWER.get(term.lower(), term)
+        }
+        for term in terms
+    ]
 
 @tool
 def standardize_diagnosis_codes(diagnoses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -393,38 +795,9 @@ def standardize_diagnosis_codes(diagnoses: List[Dict[str, Any]]) -> List[Dict[st
     Returns:
         Standardized diagnoses with ICD-10 codes
     """
-    # Simplified mapping of common diagnoses to ICD-10 codes
-    icd10_mapping = {
-        'hypertension': 'I10',
-        'diabetes': 'E11.9',
-        'diabetes mellitus': 'E11.9',
-        'type 2 diabetes': 'E11.9',
-        'asthma': 'J45.909',
-        'pneumonia': 'J18.9',
-        'urinary tract infection': 'N39.0',
-        'uti': 'N39.0',
-        'acute bronchitis': 'J20.9',
-        'bronchitis': 'J20.9',
-        'depression': 'F32.9',
-        'anxiety': 'F41.9',
-        'gerd': 'K21.9',
-        'gastroesophageal reflux disease': 'K21.9',
-        'congestive heart failure': 'I50.9',
-        'chf': 'I50.9',
-        'coronary artery disease': 'I25.10',
-        'cad': 'I25.10'
-    }
-    
     standardized_diagnoses = []
     for diagnosis in diagnoses:
-        description = diagnosis['description'].lower()
-        icd_code = None
-        
-        # Check for exact matches
-        for term, code in icd10_mapping.items():
-            if term in description:
-                icd_code = code
-                break
+        icd_code = _longest_match(_ICD10_AUTOMATON, diagnosis['description'])
         
         standardized_diagnoses.append({
             'description': diagnosis['description'],
@@ -444,34 +817,9 @@ def standardize_procedure_codes(procedures: List[Dict[str, Any]]) -> List[Dict[s
     Returns:
         Standardized procedures with CPT codes
     """
-    # Simplified mapping of common procedures to CPT codes
-    cpt_mapping = {
-        'office visit': '99213',
-        'chest x-ray': '71045',
-        'echocardiogram': '93306',
-        'colonoscopy': '45378',
-        'upper endoscopy': '43235',
-        'mri brain': '70553',
-        'ct scan abdomen': '74177',
-        'complete blood count': '85025',
-        'cbc': '85025',
-        'comprehensive metabolic panel': '80053',
-        'cmp': '80053',
-        'lipid panel': '80061',
-        'flu vaccine': '90688',
-        'influenza vaccine': '90688'
-    }
-    
     standardized_procedures = []
     for procedure in procedures:
-        description = procedure['description'].lower()
-        cpt_code = None
-        
-        # Check for exact matches
-        for term, code in cpt_mapping.items():
-            if term in description:
-                cpt_code = code
-                break
+        cpt_code = _longest_match(_CPT_AUTOMATON, procedure['description'])
         
         standardized_procedures.append({
             'description': procedure['description'],
@@ -491,41 +839,29 @@ def normalize_abbreviations(text: str) -> str:
     Returns:
         Text with expanded abbreviations
     """
-    # Common medical abbreviations
-    abbreviations = {
-        'HTN': 'Hypertension',
-        'DM': 'Diabetes Mellitus',
-        'COPD': 'Chronic Obstructive Pulmonary Disease',
-        'CHF': 'Congestive Heart Failure',
-        'CAD': 'Coronary Artery Disease',
-        'MI': 'Myocardial Infarction',
-        'CVA': 'Cerebrovascular Accident',
-        'UTI': 'Urinary Tract Infection',
-        'URI': 'Upper Respiratory Infection',
-        'LBP': 'Low Back Pain',
-        'Hx': 'History',
-        'Dx': 'Diagnosis',
-        'Tx': 'Treatment',
-        'Fx': 'Fracture',
-        'Sx': 'Symptoms',
-        'Pt': 'Patient',
-        'yo': 'year old',
-        'y/o': 'year old',
-        'b/l': 'bilateral',
-        'w/': 'with',
-        'w/o': 'without',
-        's/p': 'status post',
-        'c/o': 'complains of',
-        'h/o': 'history of'
-    }
-    
-    normalized_text = text
-    for abbr, expansion in abbreviations.items():
-        # Replace abbreviations with word boundaries
-        pattern = r'\b' + re.escape(abbr) + r'\b'
-        normalized_text = re.sub(pattern, expansion, normalized_text, flags=re.IGNORECASE)
+    # Expand every abbreviation in a single pass over the text
+    return _ABBREVIATION_PATTERN.sub(
+        lambda match: _ABBREVIATIONS_BY_LOWER[match.group(0).lower()],
+        text
+    )
+
+def _dedupe_key(item: Dict[str, Any]) -> Any:
+    """
+    Build a hashable key identifying an entry by its contents.
     
-    return normalized_text
+    Args:
+        item: Entry to build the key for
+        
+    Returns:
+        Key that is equal for entries with equal contents
+    """
+    try:
+        key = tuple(sorted(item.items()))
+        hash(key)
+        return key
+    except TypeError:
+        # Nested lists or dicts are not hashable, compare their JSON instead
+        return json.dumps(item, sort_keys=True, default=str)
 
 @tool
 def remove_duplicates(data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
@@ -541,18 +877,17 @@ def remove_duplicates(data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[D
     result = {}
     
     for key, items in data.items():
-        if not items:
-            result[key] = []
-            continue
-        
-        # Convert to DataFrame for easier deduplication
-        df = pd.DataFrame(items)
+        seen = set()
+        unique_items = []
         
-        # Drop duplicates
-        df_deduped = df.drop_duplicates()
+        # Keep the first occurrence of each entry, in order
+        for item in items or []:
+            dedupe_key = _dedupe_key(item)
+            if dedupe_key not in seen:
+                seen.add(dedupe_key)
+                unique_items.append(item)
         
-        # Convert back to list of dictionaries
-        result[key] = df_deduped.to_dict('records')
+        result[key] = unique_items
     
     return result
 
@@ -575,6 +910,9 @@ class DataCollectorCrew:
     
     def setup_agents(self):
         """Set up the agents for the crew."""
+        from crewai import Agent
+        
+        llm = _get_llm()
         
         # Data Extraction Agent
         self.extraction_agent = Agent(
@@ -632,6 +970,7 @@ class DataCollectorCrew:
     
     def setup_crew(self):
         """Set up the crew with the agents and their tasks."""
+        from crewai import Task, Crew, Process
         
         # Define tasks
         extraction_task = Task(
@@ -693,21 +1032,81 @@ class DataCollectorCrew:
         
         return result
 
-def process_file(file_path: str) -> Dict[str, Any]:
+# Data collector crews, one per thread since CrewAI mutates the tasks while
+# a crew runs. The LLM client from _get_llm() is shared by all of them.
+_crews = threading.local()
+
+def _get_crew() -> DataCollectorCrew:
+    """
+    Get the data collector crew of the current thread, creating it on first use.
+    
+    Returns:
+        DataCollectorCrew reused for every file processed on this thread
+    """
+    crew = getattr(_crews, 'crew', None)
+    if crew is None:
+        crew = _crews.crew = DataCollectorCrew()
+    return crew
+
+# Directory processed results are cached in, keyed by file content hash
+RESULT_CACHE_DIR = Path(os.environ.get("RCM_COLLECTOR_CACHE_DIR", Path.home() / ".cache" / "rcm_collector"))
+
+# Bump when the prompts, models or result format change, so results of
+# the previous pipeline are not served from the cache
+RESULT_CACHE_VERSION = 1
+
+def _content_hash(file_path: str) -> str:
+    """
+    Hash the content of a file, with BLAKE3 if installed and SHA-256 otherwise.
+    
+    Args:
+        file_path: Path to the file to hash
+        
+    Returns:
+        Hex digest prefixed by the name of the hash algorithm
+    """
+    try:
+        from blake3 import blake3 as hasher
+        name = "blake3"
+    except ImportError:
+        hasher = hashlib.sha256
+        name = "sha256"
+    
+    with open(file_path, 'rb') as f:
+        # Empty files cannot be memory-mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return f"{name}-{hasher(b'').hexdigest()}"
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return f"{name}-{hasher(mm).hexdigest()}"
+
+def process_file(file_path: str, use_cache: bool = True) -> Dict[str, Any]:
     """
     Process a medical data file using the DataCollectorCrew.
     
+    Results are cached under RESULT_CACHE_DIR by the hash of the file
+    content, so unchanged files are not processed again. Results nothing
+    could be extracted from are not cached, so failed runs are retried.
+    
     Args:
         file_path: Path to the file to process
+        use_cache: Whether to reuse and store cached results
         
     Returns:
         Processing results as a structured JSON object
     """
-    # Initialize the crew
-    crew = DataCollectorCrew()
+    cache_path = None
+    if use_cache:
+        key = _content_hash(file_path)
+        cache_path = RESULT_CACHE_DIR / f"v{RESULT_CACHE_VERSION}" / key[-2:] / f"{key}.json"
+        
+        try:
+            return orjson.loads(cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            pass
     
     # Run the crew on the file
-    result = crew.run({'file_path': file_path})
+    result = _get_crew().run({'file_path': file_path})
     
     # Convert CrewOutput to a structured dictionary
     structured_data = extract_structured_data(result)
@@ -715,20 +1114,77 @@ def process_file(file_path: str) -> Dict[str, Any]:
     # Save the processed data to the database
     db_result = save_to_database(structured_data)
     
+    if cache_path is not None and structured_data != _empty_structured_data():
+        # Write to a temporary file first so readers never see a partial result
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(orjson.dumps(structured_data))
+        os.replace(tmp_path, cache_path)
+    
     return structured_data
 
-def extract_structured_data(result) -> Dict[str, Any]:
+def _task_output_data(task_output) -> Optional[Dict[str, Any]]:
     """
-    Extract and structure data from the crew result.
+    Get the structured data of a single task output.
     
     Args:
-        result: Result from the crew run
+        task_output: CrewAI TaskOutput
         
     Returns:
-        Structured data in the required format
+        Task output as a dictionary, or None if it is not JSON
     """
-    # Initialize the structured data with empty values
-    structured_data = {
+    if getattr(task_output, 'json_dict', None):
+        return task_output.json_dict
+    
+    raw = (getattr(task_output, 'raw', None) or '').strip()
+    
+    # Agents often wrap JSON answers in a markdown code block
+    if raw.startswith('```'):
+        raw = raw.strip('`')
+        if raw.startswith('json'):
+            raw = raw[len('json'):]
+    
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    
+    return data if isinstance(data, dict) else None
+
+def _merge_structured_data(structured_data: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """
+    Merge task output data into the structured data in place.
+    
+    Only keys of the structured data are merged. Non-empty lists and values
+    replace the current ones, dictionaries are merged recursively. Values of
+    a different type than the template, such as a string where a list of
+    diagnoses is expected, are ignored.
+    
+    Args:
+        structured_data: Structured data to update
+        data: Task output data
+    """
+    for key, current in structured_data.items():
+        value = data.get(key)
+        if value in (None, '', [], {}) or not isinstance(value, type(current)):
+            continue
+        
+        if isinstance(current, dict) and isinstance(value, dict):
+            if current:
+                _merge_structured_data(current, value)
+            else:
+                current.update(value)
+        else:
+            structured_data[key] = value
+
+def _empty_structured_data() -> Dict[str, Any]:
+    """
+    Create the structured data template with empty values.
+    
+    Returns:
+        Structured data in the required format, with nothing extracted
+    """
+    return {
         "patient": {
             "name": "",
             "mrn": "",
@@ -757,34 +1213,40 @@ def extract_structured_data(result) -> Dict[str, Any]:
             "date_signed": ""
         }
     }
+
+def extract_structured_data(result) -> Dict[str, Any]:
+    """
+    Extract and structure data from the crew result.
+    
+    Args:
+        result: Result from the crew run
+        
+    Returns:
+        Structured data in the required format
+    """
+    # Initialize the structured data with empty values
+    structured_data = _empty_structured_data()
     
     # Try to extract data from the result
     try:
-        # Convert result to string for regex parsing
-        result_str = str(result)
-        
-        # Extract diagnoses
-        diagnoses = extract_diagnoses(result_str)
-        if diagnoses:
-            structured_data["diagnoses"] = diagnoses
-            # Add ICD codes to billing
-            for diagnosis in diagnoses:
-                if "code" in diagnosis and diagnosis["code"] and diagnosis["code"] not in structured_data["billing"]["icd_10_codes"]:
-                    structured_data["billing"]["icd_10_codes"].append(diagnosis["code"])
-        
-        # Extract medications
-        medications = extract_medications(result_str)
-        if medications:
-            structured_data["medications"] = medications
-        
-        # Extract procedures
-        procedures = extract_procedures(result_str)
-        if procedures:
-            structured_data["procedures"] = procedures
-            # Add CPT codes to billing
-            for procedure in procedures:
-                if "code" in procedure and procedure["code"] and procedure["code"] not in structured_data["billing"]["cpt_codes"]:
-                    structured_data["billing"]["cpt_codes"].append(procedure["code"])
+        # Merge the structured output of each task in order, later tasks
+        # refine what earlier ones extracted
+        for task_output in getattr(result, 'tasks_output', None) or []:
+            data = _task_output_data(task_output)
+            if data:
+                _merge_structured_data(structured_data, data)
+        
+        # Add ICD codes to billing
+        for diagnosis in structured_data["diagnoses"]:
+            code = (diagnosis.get("code") or diagnosis.get("icd_code")) if isinstance(diagnosis, dict) else None
+            if code and code not in structured_data["billing"]["icd_10_codes"]:
+                structured_data["billing"]["icd_10_codes"].append(code)
+        
+        # Add CPT codes to billing
+        for procedure in structured_data["procedures"]:
+            code = (procedure.get("code") or procedure.get("cpt_code")) if isinstance(procedure, dict) else None
+            if code and code not in structured_data["billing"]["cpt_codes"]:
+                structured_data["billing"]["cpt_codes"].append(code)
         
     except Exception as e:
         print(f"Error extracting structured data: {str(e)}")
@@ -802,6 +1264,8 @@ def save_to_database(data: Dict[str, Any]) -> Dict[str, Any]:
         Result of the database operation
     """
     try:
+        _setup_django()
+        
         # Database saving logic here
         # ...
         
@@ -814,68 +1278,298 @@ def save_to_database(data: Dict[str, Any]) -> Dict[str, Any]:
             "error": f"Failed to save data to database: {str(e)}"
         }
 
-def process_directory(directory_path: str) -> Dict[str, List[Dict[str, Any]]]:
+# Number of rows inserted per INSERT statement when bulk saving
+DB_BATCH_SIZE = 1000
+
+# Date formats found in extracted data, tried in order after ISO 8601
+_DATE_FORMATS = ('%m/%d/%Y', '%Y%m%d', '%d-%b-%Y')
+
+def _parse_date(value: Any) -> Optional[date]:
     """
-    Process all medical data files in a directory using the DataCollectorCrew.
+    Parse a date from extracted data.
     
     Args:
-        directory_path: Path to the directory containing files to process
+        value: Date string in one of the supported formats
         
     Returns:
-        Processing results for all files
+        Parsed date, or None if the value is empty or not a date
     """
-    results = {
-        "processed_files": [],
-        "errors": []
-    }
+    if not value or not isinstance(value, str):
+        return None
+    
+    value = value.strip()
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    
+    return None
+
+def _record_dict(value: Any) -> Dict[str, Any]:
+    """
+    Get a nested object of extracted data.
+    
+    Args:
+        value: Value the agents returned for an object
+        
+    Returns:
+        The value if it is a dictionary, otherwise an empty dictionary
+    """
+    return value if isinstance(value, dict) else {}
+
+def _record_text(value: Any) -> str:
+    """
+    Get a text field of extracted data.
+    
+    Args:
+        value: Value the agents returned for a text field
+        
+    Returns:
+        The value as stripped text, or an empty string if it is not text or a number
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return ""
+    return str(value).strip()
+
+def bulk_save_to_database(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Save many processed results to the database using batched inserts.
+    
+    Patients are inserted first, existing patient IDs are left untouched, then
+    the diagnoses and procedures of all results are inserted in batches of
+    DB_BATCH_SIZE rows. Results without a patient MRN or date of birth, and
+    diagnoses and procedures without a code or date, are skipped. Malformed
+    values in one result, such as a diagnosis that is not an object, skip
+    only that value instead of failing the whole batch.
     
+    Args:
+        results: Structured data returned by process_file
+        
+    Returns:
+        Result of the database operation with the number of rows submitted
+    """
     try:
-        # Get all files in the directory
-        files = [f for f in os.listdir(directory_path) if os.path.isfile(os.path.join(directory_path, f))]
+        _setup_django()
+        from django.db import transaction
+        from main.models import Patient, Diagnosis, Procedure, Gender, DESCRIPTION_MAX_LENGTH
         
-        # Process each file
-        for file_name in files:
-            file_path = os.path.join(directory_path, file_name)
-            print(f"Processing file: {file_path}")
+        patients = {}
+        for data in results:
+            patient = _record_dict(_record_dict(data).get("patient"))
+            patient_id = _record_text(patient.get("mrn"))
+            date_of_birth = _parse_date(patient.get("dob"))
+            if not patient_id or not date_of_birth or patient_id in patients:
+                continue
             
-            try:
-                # Process the file
-                result = process_file(file_path)
+            first_name, _, last_name = _record_text(patient.get("name")).partition(" ")
+            patients[patient_id] = Patient(
+                patient_id=patient_id,
+                first_name=first_name,
+                last_name=last_name,
+                date_of_birth=date_of_birth,
+                gender=Gender.from_code(patient.get("gender"))
+            )
+        
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients.values(), batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+            
+            # ignore_conflicts leaves primary keys unset, look them up in one query
+            patient_pks = dict(
+                Patient.objects.filter(patient_id__in=patients).values_list('patient_id', 'pk')
+            )
+            
+            diagnoses = []
+            procedures = []
+            for data in results:
+                data = _record_dict(data)
+                patient_pk = patient_pks.get(_record_text(_record_dict(data.get("patient")).get("mrn")))
+                if patient_pk is None:
+                    continue
                 
-                # Add to results
-                results["processed_files"].append({
-                    "file_name": file_name,
-                    "file_path": file_path,
-                    "result": result
-                })
+                visit = _record_dict(data.get("visit"))
+                visit_date = _parse_date(visit.get("date"))
+                provider_name = _record_text(_record_dict(visit.get("provider")).get("name"))
                 
-            except Exception as e:
-                # Log the error
-                error_message = f"Error processing file {file_path}: {str(e)}"
-                print(error_message)
+                diagnosis_list = data.get("diagnoses")
+                for diagnosis in diagnosis_list if isinstance(diagnosis_list, list) else []:
+                    if not isinstance(diagnosis, dict):
+                        continue
+                    icd_code = _record_text(diagnosis.get("code") or diagnosis.get("icd_code"))
+                    diagnosis_date = _parse_date(diagnosis.get("diagnosis_date") or diagnosis.get("date")) or visit_date
+                    if not icd_code or diagnosis_date is None:
+                        continue
+                    diagnoses.append(Diagnosis(
+                        patient_id=patient_pk,
+                        icd_code=icd_code,
+                        description=_record_text(diagnosis.get("description"))[:DESCRIPTION_MAX_LENGTH],
+                        diagnosis_date=diagnosis_date
+                    ))
                 
-                # Add to errors
-                results["errors"].append({
-                    "file_name": file_name,
-                    "file_path": file_path,
-                    "error": str(e)
-                })
+                procedure_list = data.get("procedures")
+                for procedure in procedure_list if isinstance(procedure_list, list) else []:
+                    if not isinstance(procedure, dict):
+                        continue
+                    cpt_code = _record_text(procedure.get("code") or procedure.get("cpt_code"))
+                    procedure_date = _parse_date(procedure.get("procedure_date") or procedure.get("date")) or visit_date
+                    if not cpt_code or procedure_date is None:
+                        continue
+                    procedures.append(Procedure(
+                        patient_id=patient_pk,
+                        cpt_code=cpt_code,
+                        description=_record_text(procedure.get("description"))[:DESCRIPTION_MAX_LENGTH],
+                        procedure_date=procedure_date,
+                        provider_name=provider_name
+                    ))
+            
+            Diagnosis.objects.bulk_create(diagnoses, batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+            Procedure.objects.bulk_create(procedures, batch_size=DB_BATCH_SIZE, ignore_conflicts=True)
+        
+        return {
+            "status": "success",
+            "message": "Data saved to database successfully",
+            "patients": len(patients),
+            "diagnoses": len(diagnoses),
+            "procedures": len(procedures)
+        }
+    except Exception as e:
+        return {
+            "error": f"Failed to save data to database: {str(e)}"
+        }
+
+def _process_directory_file(file_path: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Process a single file of a directory, capturing any error.
+    
+    Args:
+        file_path: Path to the file to process
+        use_cache: Whether to reuse and store cached results
+        
+    Returns:
+        Processed file entry, or an error entry if processing failed
+    """
+    file_name = os.path.basename(file_path)
+    print(f"Processing file: {file_path}")
+    
+    try:
+        # Process the file
+        result = process_file(file_path, use_cache)
+        
+        return {
+            "file_name": file_name,
+            "file_path": file_path,
+            "result": result
+        }
+        
+    except Exception as e:
+        # Log the error
+        error_message = f"Error processing file {file_path}: {str(e)}"
+        print(error_message)
+        
+        return {
+            "file_name": file_name,
+            "file_path": file_path,
+            "error": str(e)
+        }
+
+def iter_directory(
+    directory_path: str,
+    max_workers: Optional[int] = None,
+    processes: bool = False,
+    use_cache: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """
+    Process all medical data files in a directory, yielding one record per file.
+    
+    Files are processed concurrently, in a thread pool by default since most
+    of the time per file is spent reading it and waiting on the LLM, or in a
+    process pool for CPU-bound extraction. Records are yielded in directory
+    order as soon as they are available, so callers can write them out
+    without holding the results of the whole directory.
+    
+    Args:
+        directory_path: Path to the directory containing files to process
+        max_workers: Number of files processed at once, defaults to the
+            number of CPUs
+        processes: Whether to process files in a process pool instead of
+            a thread pool
+        use_cache: Whether to reuse and store cached results
+        
+    Yields:
+        Processed file entries, or error entries for files or a directory
+        that failed to process
+    """
+    try:
+        # Get all files in the directory, in a stable order across runs
+        with os.scandir(directory_path) as it:
+            files = sorted(entry.path for entry in it if entry.is_file())
+        
+        max_workers = max_workers or os.cpu_count()
+        process = functools.partial(_process_directory_file, use_cache=use_cache)
+        
+        if processes:
+            # Send files to the workers in chunks to amortize pickling, with
+            # a few chunks per worker to keep the load balanced
+            chunksize = max(1, len(files) // (max_workers * 4))
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                yield from executor.map(process, files, chunksize=chunksize)
+            return
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Process the files, keeping results in directory order
+            yield from executor.map(process, files)
     
     except Exception as e:
         # Log the error
         error_message = f"Error processing directory {directory_path}: {str(e)}"
         print(error_message)
         
-        # Add to errors
-        results["errors"].append({
+        yield {
             "directory_path": directory_path,
             "error": str(e)
-        })
+        }
+
+def process_directory(
+    directory_path: str,
+    max_workers: Optional[int] = None,
+    processes: bool = False,
+    use_cache: bool = True
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Process all medical data files in a directory using the DataCollectorCrew.
+    
+    Args:
+        directory_path: Path to the directory containing files to process
+        max_workers: Number of files processed at once, defaults to the
+            number of CPUs
+        processes: Whether to process files in a process pool instead of
+            a thread pool
+        use_cache: Whether to reuse and store cached results
+        
+    Returns:
+        Processing results for all files
+    """
+    results = {
+        "processed_files": [],
+        "errors": []
+    }
+    
+    for record in iter_directory(directory_path, max_workers, processes, use_cache):
+        if "error" in record:
+            results["errors"].append(record)
+        else:
+            results["processed_files"].append(record)
     
     return results
 
 if __name__ == "__main__":
     # Example usage
+    ensure_api_key()
     crew = DataCollectorCrew()
     
     # Process a sample file
@@ -1,37 +1,279 @@
 #!/usr/bin/env python
 import os
 import sys
-import json
-import argparse
+import contextlib
+import orjson
 from pathlib import Path
+from types import SimpleNamespace
 
 # Add the parent directory to the path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _parent_dir not in sys.path:
+    sys.path.insert(0, _parent_dir)
 
 # Import the data collector
-from data_collector import DataCollectorCrew, process_file, process_directory
+from data_collector import DataCollectorCrew, process_file, process_directory, iter_directory, bulk_save_to_database, DB_BATCH_SIZE, _setup_django, _get_crew, ensure_api_key
 
-def main():
+# orjson options for the output JSON: indented like json.dump(indent=2),
+# timezone-naive datetimes written as UTC and numpy values serialized natively
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+
+# Output formats by output file extension
+FORMAT_EXTENSIONS = {
+    '.mp': 'msgpack',
+    '.msgpack': 'msgpack',
+    '.cbor': 'cbor',
+}
+
+def encode_output(result, output_format: str) -> bytes:
     """
-    Main function to run the data collector agent.
+    Encode the result in an output format.
+    
+    Args:
+        result: Result to encode
+        output_format: One of json, msgpack or cbor
+        
+    Returns:
+        Encoded result
+    """
+    if output_format == 'msgpack':
+        import msgpack
+        return msgpack.packb(result, use_bin_type=True)
+    
+    if output_format == 'cbor':
+        import cbor2
+        return cbor2.dumps(result)
+    
+    return orjson.dumps(result, option=JSON_OPTIONS)
+
+def write_jsonl(records, output: str = None, verbose: bool = False):
+    """
+    Write records as JSON Lines as they are produced.
+    
+    Args:
+        records: Iterable of records to write
+        output: Path to save the records to
+        verbose: Whether to also print each record
+    """
+    f = None
+    if output:
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(output_path, 'wb')
+    
+    try:
+        for record in records:
+            line = orjson.dumps(record, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+            
+            if f:
+                f.write(line)
+            
+            if verbose:
+                sys.stdout.flush()
+                sys.stdout.buffer.write(line)
+                sys.stdout.flush()
+    finally:
+        if f:
+            f.close()
+    
+    if output:
+        print(f"Results saved to: {output}")
+
+def commit_records(records):
     """
+    Save the results of directory records to the database in batches while
+    passing the records through.
+    
+    Args:
+        records: Iterable of directory records
+        
+    Yields:
+        The records, unchanged
+    """
+    batch = []
+    for record in records:
+        if "result" in record:
+            batch.append(record["result"])
+            if len(batch) >= DB_BATCH_SIZE:
+                print(bulk_save_to_database(batch))
+                batch = []
+        yield record
+    
+    if batch:
+        print(bulk_save_to_database(batch))
+
+# Command line options as (flag, type, help), a type of None marks a switch
+OPTIONS = [
+    ('--file', str, 'Path to a single file to process'),
+    ('--dir', str, 'Path to a directory of files to process'),
+    ('--output', str, 'Path to save the output JSON'),
+    ('--verbose', None, 'Enable verbose output'),
+    ('--workers', int, 'Number of files processed at once (defaults to the number of CPU cores)'),
+    ('--io-bound', None, 'Process directory files in threads instead of processes'),
+    ('--commit', None, 'Save the results to the database'),
+    ('--no-cache', None, 'Process every file again instead of reusing cached results'),
+    ('--format', str, 'Output file format: json, msgpack or cbor (defaults to the output file extension, otherwise json)'),
+    ('--daemon', None, 'Keep running and process file paths read from stdin, one per line, writing one JSON result per line'),
+    ('--jsonl', None, 'Write directory results as JSON Lines, one record per file (implied by a .jsonl output path)'),
+]
+
+def build_parser():
+    """
+    Build the argparse parser for the command line options.
+    
+    Returns:
+        Argument parser
+    """
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Medical Data Collector Agent')
     
     # Add arguments
-    parser.add_argument('--file', type=str, help='Path to a single file to process')
-    parser.add_argument('--dir', type=str, help='Path to a directory of files to process')
-    parser.add_argument('--output', type=str, help='Path to save the output JSON')
-    parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
+    for flag, option_type, help_text in OPTIONS:
+        if option_type is None:
+            parser.add_argument(flag, action='store_true', help=help_text)
+        else:
+            parser.add_argument(flag, type=option_type, help=help_text)
+    
+    return parser
+
+def parse_args(argv=None):
+    """
+    Parse the command line without importing argparse for well-formed input.
+    
+    Help requests and anything the simple parser does not understand are
+    handed to argparse, so usage and error messages stay the same.
+    
+    Args:
+        argv: Arguments to parse, defaults to sys.argv[1:]
+        
+    Returns:
+        Parsed arguments
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    options = {flag: option_type for flag, option_type, _ in OPTIONS}
+    args = {flag[2:].replace('-', '_'): (False if option_type is None else None) for flag, option_type in options.items()}
     
+    i = 0
+    while i < len(argv):
+        flag, has_value, value = argv[i].partition('=')
+        if flag not in options:
+            return build_parser().parse_args(argv)
+        
+        option_type = options[flag]
+        if option_type is None:
+            if has_value:
+                return build_parser().parse_args(argv)
+            value = True
+        elif not has_value:
+            i += 1
+            # A missing value, or one that looks like an option (e.g.
+            # "--output --verbose"), is left to argparse to report
+            if i >= len(argv) or argv[i].startswith('-'):
+                return build_parser().parse_args(argv)
+            value = argv[i]
+        
+        if option_type is not None:
+            try:
+                value = option_type(value)
+            except ValueError:
+                return build_parser().parse_args(argv)
+        
+        args[flag[2:].replace('-', '_')] = value
+        i += 1
+    
+    return SimpleNamespace(**args)
+
+def run_daemon(use_cache: bool = True, commit: bool = False):
+    """
+    Process file paths read from stdin until it is closed.
+    
+    Django and the crew are set up once, so an orchestrator piping many
+    paths in doesn't pay for startup per file. Each result is written to
+    stdout as a single JSON line as soon as the file is processed.
+    
+    Args:
+        use_cache: Whether to reuse and store cached results
+        commit: Whether to save each result to the database
+    """
+    # stdin carries file paths, so the API key cannot be prompted for
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY must be set in the environment or .env file in daemon mode.", file=sys.stderr)
+        sys.exit(1)
+    
+    _setup_django()
+    
+    # Build the crew before the first path arrives, so setup errors stop the
+    # daemon instead of being reported for every file
+    with contextlib.redirect_stdout(sys.stderr):
+        _get_crew()
+    
+    # Results are the only thing written to stdout, progress and agent logs
+    # go to stderr
+    output = sys.stdout
+    
+    for line in sys.stdin:
+        # Only the line ending is removed, file names may start or end with spaces
+        file_path = line.rstrip('\r\n')
+        if not file_path:
+            continue
+        
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                result = process_file(file_path, use_cache=use_cache)
+                record = {"file_path": file_path, "result": result}
+                
+                if commit:
+                    record["database"] = bulk_save_to_database([result])
+        except Exception as e:
+            record = {"file_path": file_path, "error": str(e)}
+        
+        output.buffer.write(orjson.dumps(record, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY) + b"\n")
+        output.flush()
+
+def main():
+    """
+    Main function to run the data collector agent.
+    """
     # Parse arguments
-    args = parser.parse_args()
+    args = parse_args()
+    
+    if args.format not in (None, 'json', 'msgpack', 'cbor'):
+        print(f"Error: Unsupported output format {args.format}, use json, msgpack or cbor.")
+        sys.exit(1)
+    
+    # Daemon and JSON Lines output are always JSON, and without --output
+    # nothing is written in the chosen format
+    jsonl = args.jsonl or bool(args.output and args.output.endswith('.jsonl'))
+    if args.format and (args.daemon or jsonl or not args.output):
+        print("Error: --format only applies to an --output file that is not JSON Lines.")
+        sys.exit(1)
+    
+    # Serve file paths from stdin
+    if args.daemon:
+        # Inputs come from stdin and results go to stdout, only the cache
+        # and database options apply
+        ignored = [
+            flag for flag, _, _ in OPTIONS
+            if flag not in ('--daemon', '--commit', '--no-cache')
+            and getattr(args, flag[2:].replace('-', '_')) not in (None, False)
+        ]
+        if ignored:
+            print(f"Error: {', '.join(ignored)} cannot be used with --daemon.")
+            sys.exit(1)
+        
+        run_daemon(use_cache=not args.no_cache, commit=args.commit)
+        return
     
     # Check if at least one input is provided
     if not args.file and not args.dir:
         print("Error: Please provide either a file (--file) or directory (--dir) to process.")
-        parser.print_help()
+        build_parser().print_help()
         sys.exit(1)
     
+    # Worker processes cannot prompt for the key, ask for it up front
+    ensure_api_key()
+    
     # Process based on input type
     if args.file:
         if not os.path.exists(args.file):
@@ -39,26 +281,58 @@ def main():
             sys.exit(1)
         
         print(f"Processing file: {args.file}")
-        result = process_file(args.file)
+        result = process_file(args.file, use_cache=not args.no_cache)
     else:
         if not os.path.exists(args.dir):
             print(f"Error: Directory {args.dir} does not exist.")
             sys.exit(1)
         
         print(f"Processing directory: {args.dir}")
-        result = process_directory(args.dir)
+        
+        # Files are extracted in separate processes unless the run is
+        # dominated by I/O
+        processes = not args.io_bound
+        
+        # Stream one record per file instead of building the whole result
+        if jsonl:
+            records = iter_directory(args.dir, args.workers, processes, not args.no_cache)
+            if args.commit:
+                records = commit_records(records)
+            write_jsonl(records, args.output, args.verbose)
+            print("Processing complete!")
+            return
+        
+        result = process_directory(args.dir, args.workers, processes, not args.no_cache)
     
-    # Print result if verbose
+    # Save the results to the database in bulk
+    if args.commit:
+        if args.file:
+            print(bulk_save_to_database([result]))
+        else:
+            print(bulk_save_to_database([record["result"] for record in result["processed_files"]]))
+    
+    # Print result if verbose, the JSON is reused if it is also saved
+    json_output = None
     if args.verbose:
-        print(json.dumps(result, indent=2))
+        json_output = orjson.dumps(result, option=JSON_OPTIONS)
+        sys.stdout.flush()
+        sys.stdout.buffer.write(json_output + b"\n")
+        sys.stdout.flush()
     
     # Save output if specified
     if args.output:
         output_path = Path(args.output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(output_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        # Binary formats are picked explicitly or by file extension
+        output_format = args.format or FORMAT_EXTENSIONS.get(output_path.suffix.lower(), 'json')
+        if output_format == 'json' and json_output is not None:
+            output = json_output
+        else:
+            output = encode_output(result, output_format)
+        
+        with open(output_path, 'wb') as f:
+            f.write(output)
         
         print(f"Results saved to: {args.output}")
     
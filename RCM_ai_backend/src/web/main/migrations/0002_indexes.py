@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clinicalnote',
+            index=models.Index(fields=['patient', 'encounter_date'], name='main_clinic_patient_c92f5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosis',
+            index=models.Index(fields=['patient', 'diagnosis_date'], name='main_diagno_patient_2c19e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosis',
+            index=models.Index(fields=['icd_code'], name='dx_icd_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=models.Index(fields=['patient', 'procedure_date'], name='main_proced_patient_420704_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procedure',
+            index=models.Index(fields=['cpt_code'], name='px_cpt_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processeddocument',
+            index=models.Index(fields=['is_processed', 'patient'], name='main_proces_is_proc_51fc40_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processeddocument',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['is_processed'], name='unprocessed_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _tables(apps, schema_editor):
+    quote = schema_editor.quote_name
+    document = quote(apps.get_model('main', 'ProcessedDocument')._meta.db_table)
+    blob = quote(apps.get_model('main', 'ProcessedDocumentContent')._meta.db_table)
+    return quote, document, blob
+
+
+def move_content(apps, schema_editor):
+    # Copied inside the database, document text can be megabytes per row
+    quote, document, blob = _tables(apps, schema_editor)
+    schema_editor.execute(
+        f'INSERT INTO {blob} ({quote("document_id")}, {quote("content")}) '
+        f'SELECT {quote("id")}, {quote("content")} FROM {document} WHERE {quote("content")} IS NOT NULL'
+    )
+
+
+def restore_content(apps, schema_editor):
+    quote, document, blob = _tables(apps, schema_editor)
+    schema_editor.execute(
+        f'UPDATE {document} SET {quote("content")} = ('
+        f'SELECT {quote("content")} FROM {blob} WHERE {blob}.{quote("document_id")} = {document}.{quote("id")})'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedDocumentContent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blob', serialize=False, to='main.processeddocument')),
+                ('content', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(move_content, restore_content),
+        migrations.RemoveField(
+            model_name='processeddocument',
+            name='content',
+        ),
+    ]
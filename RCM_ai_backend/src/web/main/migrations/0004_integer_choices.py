@@ -0,0 +1,146 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+from django.db import migrations, models
+
+# Stored strings, lowercased, mapped to the integer choices. Unknown values
+# map to 0 (Unknown/Other).
+GENDER_CODES = {
+    'm': 1, 'male': 1,
+    'f': 2, 'female': 2,
+    'o': 3, 'other': 3,
+}
+
+NOTE_TYPE_CODES = {
+    'progress': 1, 'progress note': 1,
+    'discharge': 2, 'discharge summary': 2,
+    'h&p': 3, 'history and physical': 3,
+    'consult': 4, 'consultation': 4, 'consultation note': 4,
+    'operative': 5, 'operative note': 5, 'op note': 5,
+}
+
+DOCUMENT_TYPE_CODES = {
+    'hl7': 1,
+    'fhir': 2,
+    'pdf': 3,
+    'text': 4, 'txt': 4,
+}
+
+# Integer choices mapped back to their labels when migrating backwards
+GENDER_LABELS = {0: 'Unknown', 1: 'Male', 2: 'Female', 3: 'Other'}
+NOTE_TYPE_LABELS = {
+    0: 'Other', 1: 'Progress Note', 2: 'Discharge Summary',
+    3: 'History and Physical', 4: 'Consultation Note', 5: 'Operative Note',
+}
+DOCUMENT_TYPE_LABELS = {0: 'Other', 1: 'HL7', 2: 'FHIR', 3: 'PDF', 4: 'Text'}
+
+# (model, string field, temporary integer field, string to code, code to label)
+FIELDS = [
+    ('Patient', 'gender', 'gender_code', GENDER_CODES, GENDER_LABELS),
+    ('ClinicalNote', 'note_type', 'note_type_code', NOTE_TYPE_CODES, NOTE_TYPE_LABELS),
+    ('ProcessedDocument', 'document_type', 'document_type_code', DOCUMENT_TYPE_CODES, DOCUMENT_TYPE_LABELS),
+]
+
+
+def strings_to_codes(apps, schema_editor):
+    # One UPDATE per distinct stored string, the columns have few values
+    for model_name, field, code_field, codes, _ in FIELDS:
+        Model = apps.get_model('main', model_name)
+        for value in Model.objects.values_list(field, flat=True).distinct():
+            code = codes.get((value or '').strip().lower(), 0)
+            Model.objects.filter(**{field: value}).update(**{code_field: code})
+
+
+def codes_to_strings(apps, schema_editor):
+    for model_name, field, code_field, _, labels in FIELDS:
+        Model = apps.get_model('main', model_name)
+        for code, label in labels.items():
+            Model.objects.filter(**{code_field: code}).update(**{field: label})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_processeddocumentcontent'),
+    ]
+
+    # varchar columns cannot be cast to smallint in place, so the codes go
+    # into new columns that then replace the string ones
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='gender_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='clinicalnote',
+            name='note_type_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='processeddocument',
+            name='document_type_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(strings_to_codes, codes_to_strings),
+        # Only needed when migrating backwards, the string columns are then
+        # added again and need a value for existing rows
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='patient',
+                name='gender',
+                field=models.CharField(default='', max_length=20),
+            ),
+            migrations.AlterField(
+                model_name='clinicalnote',
+                name='note_type',
+                field=models.CharField(default='', max_length=50),
+            ),
+            migrations.AlterField(
+                model_name='processeddocument',
+                name='document_type',
+                field=models.CharField(default='', max_length=50),
+            ),
+        ]),
+        migrations.RemoveField(
+            model_name='patient',
+            name='gender',
+        ),
+        migrations.RemoveField(
+            model_name='clinicalnote',
+            name='note_type',
+        ),
+        migrations.RemoveField(
+            model_name='processeddocument',
+            name='document_type',
+        ),
+        migrations.RenameField(
+            model_name='patient',
+            old_name='gender_code',
+            new_name='gender',
+        ),
+        migrations.RenameField(
+            model_name='clinicalnote',
+            old_name='note_type_code',
+            new_name='note_type',
+        ),
+        migrations.RenameField(
+            model_name='processeddocument',
+            old_name='document_type_code',
+            new_name='document_type',
+        ),
+        migrations.AlterField(
+            model_name='patient',
+            name='gender',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Male'), (2, 'Female'), (3, 'Other')], default=0),
+        ),
+        migrations.AlterField(
+            model_name='clinicalnote',
+            name='note_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Progress Note'), (2, 'Discharge Summary'), (3, 'History and Physical'), (4, 'Consultation Note'), (5, 'Operative Note')], db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='processeddocument',
+            name='document_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'HL7'), (2, 'FHIR'), (3, 'PDF'), (4, 'Text')], db_index=True),
+        ),
+    ]
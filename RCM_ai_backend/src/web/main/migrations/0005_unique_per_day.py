@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep the oldest row of each (patient, code, date), the unique
+    # constraints below cannot be created while duplicates exist
+    for model_name, code_field, date_field in [
+        ('Diagnosis', 'icd_code', 'diagnosis_date'),
+        ('Procedure', 'cpt_code', 'procedure_date'),
+    ]:
+        Model = apps.get_model('main', model_name)
+        duplicates = (
+            Model.objects.values('patient', code_field, date_field)
+            .annotate(keep=models.Min('pk'), count=models.Count('pk'))
+            .filter(count__gt=1)
+        )
+        for duplicate in duplicates.iterator():
+            keep = duplicate.pop('keep')
+            del duplicate['count']
+            Model.objects.filter(**duplicate).exclude(pk=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_integer_choices'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='diagnosis',
+            constraint=models.UniqueConstraint(fields=('patient', 'icd_code', 'diagnosis_date'), name='uniq_dx_per_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='procedure',
+            constraint=models.UniqueConstraint(fields=('patient', 'cpt_code', 'procedure_date'), name='uniq_px_per_day'),
+        ),
+    ]
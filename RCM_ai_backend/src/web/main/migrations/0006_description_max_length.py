@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+from django.db import migrations, models
+from django.db.models.functions import Length, Substr
+
+DESCRIPTION_MAX_LENGTH = 512
+
+
+def truncate_descriptions(apps, schema_editor):
+    # Longer descriptions would make the ALTER fail on PostgreSQL and MySQL
+    # strict mode
+    for model_name in ('Diagnosis', 'Procedure'):
+        Model = apps.get_model('main', model_name)
+        Model.objects.annotate(description_length=Length('description')).filter(
+            description_length__gt=DESCRIPTION_MAX_LENGTH
+        ).update(description=Substr('description', 1, DESCRIPTION_MAX_LENGTH))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.RunPython(truncate_descriptions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='diagnosis',
+            name='description',
+            field=models.CharField(max_length=512),
+        ),
+        migrations.AlterField(
+            model_name='procedure',
+            name='description',
+            field=models.CharField(max_length=512),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.6 on 2026-10-15 21:30
+
+from django.db import migrations
+
+# (model, column, max_length) compared byte-wise: patient IDs and billing
+# codes are ASCII identifiers, so linguistic collation only slows lookups
+ASCII_COLUMNS = [
+    ('Patient', 'patient_id', 50),
+    ('Diagnosis', 'icd_code', 20),
+    ('Procedure', 'cpt_code', 20),
+]
+
+# (model, index, code column) of the code to description lookup indexes
+CODE_INDEXES = [
+    ('Diagnosis', 'dx_icd_code_idx', 'icd_code'),
+    ('Procedure', 'px_cpt_code_idx', 'cpt_code'),
+]
+
+
+def _alter_collation(apps, schema_editor, collate):
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+    for model_name, column, max_length in ASCII_COLUMNS:
+        table = quote(apps.get_model('main', model_name)._meta.db_table)
+        if vendor == 'postgresql':
+            collation = quote('C' if collate else 'default')
+            schema_editor.execute(
+                f'ALTER TABLE {table} ALTER COLUMN {quote(column)} TYPE varchar({max_length}) COLLATE {collation}'
+            )
+        elif vendor == 'mysql':
+            charset = ' CHARACTER SET ascii COLLATE ascii_bin' if collate else ''
+            schema_editor.execute(
+                f'ALTER TABLE {table} MODIFY {quote(column)} varchar({max_length}){charset} NOT NULL'
+            )
+
+
+def _recreate_code_indexes(apps, schema_editor, covering):
+    # INCLUDE columns are only supported by PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for model_name, index, column in CODE_INDEXES:
+        table = quote(apps.get_model('main', model_name)._meta.db_table)
+        include = f' INCLUDE ({quote("description")})' if covering else ''
+        schema_editor.execute(f'DROP INDEX IF EXISTS {quote(index)}')
+        schema_editor.execute(f'CREATE INDEX {quote(index)} ON {table} ({quote(column)}){include}')
+
+
+def apply_vendor_ddl(apps, schema_editor):
+    _alter_collation(apps, schema_editor, collate=True)
+    _recreate_code_indexes(apps, schema_editor, covering=True)
+
+
+def revert_vendor_ddl(apps, schema_editor):
+    _recreate_code_indexes(apps, schema_editor, covering=False)
+    _alter_collation(apps, schema_editor, collate=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_description_max_length'),
+    ]
+
+    # Database-only changes that differ per vendor, SQLite already compares
+    # bytes and has no covering indexes, so nothing runs there. The model
+    # state is unchanged.
+    operations = [
+        migrations.RunPython(apply_vendor_ddl, revert_vendor_ddl),
+    ]
@@ -1,15 +1,95 @@
 from django.db import models
 
+# Patient IDs and ICD-10/CPT codes use a byte-wise collation, and the code
+# indexes include the description, on the backends that support it. Both
+# depend on the database vendor, so they are applied by migration
+# 0007_vendor_ddl instead of being declared here, which would tie generated
+# migrations to the backend of whoever ran makemigrations.
+
+# Maximum length of ICD-10/CPT code descriptions
+DESCRIPTION_MAX_LENGTH = 512
+
+# Number of description characters shown in diagnosis and procedure labels
+DESCRIPTION_LABEL_LENGTH = 40
+
+class Gender(models.IntegerChoices):
+    UNKNOWN = 0, 'Unknown'
+    MALE = 1, 'Male'
+    FEMALE = 2, 'Female'
+    OTHER = 3, 'Other'
+    
+    @classmethod
+    def from_code(cls, value):
+        """
+        Map an HL7 (M/F/O/U) or FHIR (male/female/other/unknown) gender code.
+        """
+        return _GENDER_CODES.get(str(value or '').strip().lower(), cls.UNKNOWN)
+
+_GENDER_CODES = {
+    'm': Gender.MALE, 'male': Gender.MALE,
+    'f': Gender.FEMALE, 'female': Gender.FEMALE,
+    'o': Gender.OTHER, 'other': Gender.OTHER,
+}
+
+class NoteType(models.IntegerChoices):
+    OTHER = 0, 'Other'
+    PROGRESS = 1, 'Progress Note'
+    DISCHARGE = 2, 'Discharge Summary'
+    HISTORY_AND_PHYSICAL = 3, 'History and Physical'
+    CONSULTATION = 4, 'Consultation Note'
+    OPERATIVE = 5, 'Operative Note'
+
+class DocumentType(models.IntegerChoices):
+    OTHER = 0, 'Other'
+    HL7 = 1, 'HL7'
+    FHIR = 2, 'FHIR'
+    PDF = 3, 'PDF'
+    TEXT = 4, 'Text'
+
+class PatientQuerySet(models.QuerySet):
+    def with_full_record(self):
+        """
+        Prefetch each patient's clinical notes with their diagnoses and
+        procedures, in a fixed number of queries.
+        """
+        return self.prefetch_related(
+            models.Prefetch('clinical_notes', queryset=ClinicalNote.with_text.prefetch_related('diagnoses', 'procedures'))
+        )
+
+class ClinicalNoteQuerySet(models.QuerySet):
+    def for_patient(self, patient_id):
+        """Notes of a patient, with the patient joined in."""
+        return self.select_related('patient').filter(patient__patient_id=patient_id)
+
+class ClinicalNoteManager(models.Manager.from_queryset(ClinicalNoteQuerySet)):
+    def get_queryset(self):
+        """Notes without their text, which can be several megabytes."""
+        return super().get_queryset().defer('note_text')
+
+class DiagnosisQuerySet(models.QuerySet):
+    def for_patient(self, patient_id):
+        """Diagnoses of a patient, with the patient and note joined in."""
+        return self.select_related('patient', 'clinical_note').filter(patient__patient_id=patient_id)
+
+class ProcedureQuerySet(models.QuerySet):
+    def for_patient(self, patient_id):
+        """Procedures of a patient, with the patient and note joined in."""
+        return self.select_related('patient', 'clinical_note').filter(patient__patient_id=patient_id)
+
 # Create your models here.
 class Patient(models.Model):
     patient_id = models.CharField(max_length=50, unique=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField()
-    gender = models.CharField(max_length=20)
+    gender = models.PositiveSmallIntegerField(choices=Gender.choices, default=Gender.UNKNOWN)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Patient.objects.with_full_record() loads a patient's whole record
+    # without a query per note
+    objects = PatientQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.patient_id})"
 
@@ -18,47 +98,110 @@ class ClinicalNote(models.Model):
     encounter_date = models.DateTimeField()
     note_text = models.TextField()
     provider_name = models.CharField(max_length=100)
-    note_type = models.CharField(max_length=50)  # e.g., Progress Note, Discharge Summary
+    note_type = models.PositiveSmallIntegerField(choices=NoteType.choices, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # ClinicalNote.objects leaves note_text out of the query, use
+    # ClinicalNote.with_text when the note body is needed
+    objects = ClinicalNoteManager()
+    with_text = ClinicalNoteQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'encounter_date']),
+        ]
+    
     def __str__(self):
-        return f"{self.note_type} - {self.patient} - {self.encounter_date}"
+        return f"{self.get_note_type_display()} - {self.encounter_date}"
+    
+    def display_with_patient(self):
+        """Label including the patient, load notes with select_related('patient')."""
+        return f"{self.get_note_type_display()} - {self.patient} - {self.encounter_date}"
 
 class Diagnosis(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='diagnoses')
     clinical_note = models.ForeignKey(ClinicalNote, on_delete=models.CASCADE, related_name='diagnoses', null=True, blank=True)
     icd_code = models.CharField(max_length=20)
-    description = models.TextField()
+    description = models.CharField(max_length=DESCRIPTION_MAX_LENGTH)
     diagnosis_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DiagnosisQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'diagnosis_date']),
+            # Code to description lookups are answered from the index alone
+            # on PostgreSQL, where 0007_vendor_ddl adds the description to it
+            models.Index(fields=['icd_code'], name='dx_icd_code_idx'),
+        ]
+        constraints = [
+            # Lets collector reruns insert with ignore_conflicts without duplicating rows
+            models.UniqueConstraint(fields=['patient', 'icd_code', 'diagnosis_date'], name='uniq_dx_per_day'),
+        ]
+    
     def __str__(self):
-        return f"{self.icd_code} - {self.description}"
+        return f"{self.icd_code} - {self.description[:DESCRIPTION_LABEL_LENGTH]}"
+    
+    def display_with_patient(self):
+        """Label including the patient, load diagnoses with select_related('patient')."""
+        return f"{self} - {self.patient}"
 
 class Procedure(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='procedures')
     clinical_note = models.ForeignKey(ClinicalNote, on_delete=models.CASCADE, related_name='procedures', null=True, blank=True)
     cpt_code = models.CharField(max_length=20)
-    description = models.TextField()
+    description = models.CharField(max_length=DESCRIPTION_MAX_LENGTH)
     procedure_date = models.DateField()
     provider_name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProcedureQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'procedure_date']),
+            models.Index(fields=['cpt_code'], name='px_cpt_code_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'cpt_code', 'procedure_date'], name='uniq_px_per_day'),
+        ]
+    
     def __str__(self):
-        return f"{self.cpt_code} - {self.description}"
+        return f"{self.cpt_code} - {self.description[:DESCRIPTION_LABEL_LENGTH]}"
+    
+    def display_with_patient(self):
+        """Label including the patient, load procedures with select_related('patient')."""
+        return f"{self} - {self.patient}"
 
 class ProcessedDocument(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='documents')
-    document_type = models.CharField(max_length=50)  # e.g., HL7, FHIR, PDF
+    document_type = models.PositiveSmallIntegerField(choices=DocumentType.choices, db_index=True)
     file_path = models.CharField(max_length=255, null=True, blank=True)
-    content = models.TextField(null=True, blank=True)
     is_processed = models.BooleanField(default=False)
     processing_errors = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_processed', 'patient']),
+            # Partial index over the documents still waiting to be processed
+            models.Index(fields=['is_processed'], condition=models.Q(is_processed=False), name='unprocessed_idx'),
+        ]
+    
     def __str__(self):
-        return f"{self.document_type} - {self.patient} - {self.created_at}"
+        return f"{self.get_document_type_display()} - {self.created_at}"
+    
+    def display_with_patient(self):
+        """Label including the patient, load documents with select_related('patient')."""
+        return f"{self.get_document_type_display()} - {self.patient} - {self.created_at}"
+
+# Extracted document text, kept out of ProcessedDocument so that listing and
+# filtering documents doesn't read the content
+class ProcessedDocumentContent(models.Model):
+    document = models.OneToOneField(ProcessedDocument, on_delete=models.CASCADE, primary_key=True, related_name='blob')
+    content = models.TextField()